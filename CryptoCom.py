@@ -16,13 +16,30 @@ import threading
 
 from models import *
 from strategies import TechnicalStrategy, BreakoutStrategy
+from candle_store import CandleStore
+from scheduler import Scheduler
+from risk import RiskEngine
+from journal import TradeJournal
+from analytics import PnlAnalytics
+from update_bus import UpdateBus
+from sampling_profiler import SamplingProfiler
+from retention import DEFAULT_RETENTION, resident_memory
+from strategy_workers import StrategyWorkers
+from metrics import WS_MESSAGES, WS_RECONNECTS, REST_LATENCY, REST_ERRORS, ORDERS, QUEUE_DEPTH, \
+    RESIDENT_MEMORY
 
 
 logger = logging.getLogger()
 
+LOG_QUEUE_SIZE = 1000  # Messages waiting to be displayed by the interface, the oldest are dropped beyond that
+
 
 class CryptoComClient:
-    def __init__(self, public_key: str, secret_key: str, testnet: bool, cryptocom: bool):
+    JOURNAL_PATH = "database.db"
+
+    def __init__(self, public_key: str, secret_key: str, testnet: bool, cryptocom: bool,
+                 risk_limits: typing.Optional[typing.Dict[str, typing.Optional[float]]] = None,
+                 retention: typing.Optional[typing.Dict[str, int]] = None, strategy_processes: int = 0):
 
         """
         https://CryptoCom-docs.github.io/apidocs/cryptocom/en
@@ -30,10 +47,18 @@ class CryptoComClient:
         :param secret_key:
         :param testnet:
         :param cryptocom: if False, the Client will be a Spot API Client
+        :param risk_limits: Overrides of the pre-trade risk limits, see risk.DEFAULT_RISK_LIMITS
+        :param retention: Overrides of the history kept in memory, see retention.DEFAULT_RETENTION
+        :param strategy_processes: Worker processes computing the signals of the Technical strategies, 0 to compute
+        them on the websocket thread
         """
 
         self.cryptocom = cryptocom
 
+        self.retention = dict(DEFAULT_RETENTION)
+        if retention is not None:
+            self.retention.update(retention)
+
         if self.cryptocom:
             self.platform = "crypto_com"
             if testnet:
@@ -50,13 +75,39 @@ class CryptoComClient:
 
         self._headers = {'X-MBX-APIKEY': self._public_key + self._secret_key}
 
+        self.scheduler = Scheduler()  # Runs the delayed and periodic tasks of the client and its strategies
+
         self.contracts = self.get_contracts()
         self.balances = self.get_balances()
 
+        self.candle_store = CandleStore(self)
+
         self.prices = dict()
+
+        self.updates = UpdateBus()  # Tells the interface what changed: "prices" (by symbol), "trades" and "logs"
+
+        # Trades changed since the interface last displayed them, by trade id
+        self._dirty_trades: typing.Dict[str, Trade] = dict()
+        self._dirty_lock = threading.Lock()
+
+        self.risk = RiskEngine(risk_limits)
+        self.journal = TradeJournal(self.JOURNAL_PATH)  # Trades and orders history, written in a background thread
+
+        self.analytics = PnlAnalytics(self.retention['analytics_buckets'])
+        self.analytics.load(self.journal)
+
+        self.profiler = SamplingProfiler()  # Started on demand from the interface or the headless API
+        self._unfilled_orders: typing.Dict[int, typing.Tuple[Contract, str, str]] = dict()  # Updated on fill
         self.strategies: typing.Dict[int, typing.Union[TechnicalStrategy, BreakoutStrategy]] = dict()
 
-        self.logs = []
+        self.workers: typing.Optional[StrategyWorkers] = None
+        if strategy_processes > 0:
+            self.workers = StrategyWorkers(self, strategy_processes)
+
+        self.logs: typing.Deque[typing.Dict[str, str]] = collections.deque(maxlen=self.retention['client_logs'])
+
+        # The connector and its strategies publish their logs here, the interface pops them as it displays them
+        self.log_queue: typing.Deque[typing.Dict[str, str]] = collections.deque(maxlen=LOG_QUEUE_SIZE)
 
         self._ws_id = 1
         self.ws: websocket.WebSocketApp
@@ -64,21 +115,140 @@ class CryptoComClient:
         self.ws_connected = False
         self.ws_subscriptions = {"book": [], "aggTrade": []}
 
+        # Queue sizes are only read when the metrics are scraped
+        QUEUE_DEPTH.labels("scheduler").set_function(lambda: self.scheduler.pending)
+        QUEUE_DEPTH.labels("journal").set_function(lambda: self.journal.pending)
+        QUEUE_DEPTH.labels("log_queue").set_function(lambda: len(self.log_queue))
+        RESIDENT_MEMORY.set_function(resident_memory)  # Should stay flat during long sessions
+
         t = threading.Thread(target=self._start_ws)
         t.start()
 
+        self.scheduler.call_every(60, self._reconcile_balances, key="reconcile_balances")
+
         logger.info("CryptoCom cryptocom Client successfully initialized")
 
-    def _add_log(self, msg: str):
+    def _add_log(self, msg: str, level: str = "INFO"):
 
         """
-        Add a log to the list so that it can be picked by the update_ui() method of the root component.
+        Add a log to the history and publish it to the queue read by the update_ui() method of the root component.
         :param msg:
+        :param level: INFO, WARNING or ERROR
+        :return:
+        """
+
+        logger.log(logging.getLevelName(level), "%s", msg, stacklevel=2, extra={"dedup": False})  # Caller's site
+
+        log = {"log": msg, "level": level, "source": "CryptoCom"}
+        self.logs.append(log)
+        self.log_queue.append(log)  # deque.append() is thread-safe
+        self.updates.notify("logs")
+
+    def mark_trade_dirty(self, trade: Trade):
+
+        """
+        Flag a trade as changed so that the interface updates its row, to be called after every change of a trade.
+        :param trade:
         :return:
         """
 
-        logger.info("%s", msg)
-        self.logs.append({"log": msg, "displayed": False})
+        with self._dirty_lock:
+            trade.version += 1
+            self._dirty_trades[trade.id] = trade
+
+        self.updates.notify("trades")
+
+    def pop_dirty_trades(self) -> typing.List[Trade]:
+
+        """
+        Get the trades changed since the last call, called by the update_ui() method of the root component.
+        :return:
+        """
+
+        with self._dirty_lock:
+            dirty_trades = self._dirty_trades
+            self._dirty_trades = dict()
+
+        return list(dirty_trades.values())
+
+    def start_strategy(self, key: typing.Hashable, strategy_type: str, contract: Contract, timeframe: str,
+                       balance_pct: float, take_profit: float, stop_loss: float,
+                       extra_params: typing.Dict, strategy_id: typing.Optional[str] = None
+                       ) -> typing.Optional[typing.Union[TechnicalStrategy, BreakoutStrategy]]:
+
+        """
+        Create a strategy, load its historical candles and its open trades, and subscribe to the market data it needs.
+        Used by the ON/OFF button of the StrategyEditor and by the headless mode.
+        Collecting the candles can take a moment when they are not in the local candle store yet.
+        :param key: Identifies the strategy in self.strategies (row of the StrategyEditor, row_key in headless mode)
+        :param strategy_type: Technical or Breakout
+        :param contract:
+        :param timeframe:
+        :param balance_pct:
+        :param take_profit:
+        :param stop_loss:
+        :param extra_params: Parameters specific to the strategy type
+        :param strategy_id: Persistent id of the strategy (row_key of the workspace), owner of its journaled trades.
+        str(key) by default
+        :return: The strategy, None if it could not be started (the reason is logged)
+        """
+
+        if strategy_type == "Technical":
+            new_strategy = TechnicalStrategy(self, contract, "CryptoCom", timeframe, balance_pct, take_profit,
+                                             stop_loss, extra_params)
+        elif strategy_type == "Breakout":
+            new_strategy = BreakoutStrategy(self, contract, "CryptoCom", timeframe, balance_pct, take_profit,
+                                            stop_loss, extra_params)
+        else:
+            self._add_log(f"Unknown strategy type {strategy_type}", "ERROR")
+            return None
+
+        new_strategy.strategy_id = strategy_id if strategy_id is not None else str(key)
+
+        new_strategy.candles = self.candle_store.get_candles(contract, timeframe, new_strategy.warmup_candles)
+
+        if len(new_strategy.candles) == 0:
+            self._add_log(f"No historical data retrieved for {contract.symbol}", "WARNING")
+            return None
+
+        open_trades = self.journal.load_open_trades(self.contracts, new_strategy.strategy_id)
+
+        # The exposure of the restored positions counts towards the risk limits, like the fills of this session
+
+        for trade in open_trades:
+            entry_side = "buy" if trade.side == "long" else "sell"
+
+            if trade.entry_price is not None:
+                self.risk.on_fill(contract, entry_side, trade.quantity, trade.entry_price)
+            else:  # Entry order not filled yet, get_order_status() reports its fill
+                self._unfilled_orders[trade.entry_id] = (contract, "MARKET", entry_side)
+
+        new_strategy.restore_trades(open_trades)
+
+        if self.workers is not None and strategy_type == "Technical":  # Breakout is too cheap to be worth it
+            new_strategy.remote_signals = True
+            self.workers.add(key, strategy_type, contract, timeframe, balance_pct, take_profit, stop_loss,
+                             extra_params, new_strategy.candles)
+
+        self.subscribe_channel([contract], "aggTrade")
+        self.subscribe_channel([contract], "book")
+
+        self.strategies[key] = new_strategy
+
+        return new_strategy
+
+    def stop_strategy(self, key: typing.Hashable):
+
+        """
+        Stop feeding market data to a strategy, its open trades stay in the journal.
+        :param key:
+        :return:
+        """
+
+        self.strategies.pop(key, None)
+
+        if self.workers is not None:
+            self.workers.remove(key)
 
     def _generate_signature(self, data: typing.Dict) -> str:
 
@@ -100,11 +270,14 @@ class CryptoComClient:
         :return:
         """
 
+        start = time.perf_counter()
+
         if method == "GET":
             try:
                 response = requests.get(self._base_url + endpoint, params=data, headers=self._headers)
             except Exception as e:  # Takes into account any possible error, most likely network errors
                 logger.error("Connection error while making %s request to %s: %s", method, endpoint, e)
+                REST_ERRORS.labels(method, endpoint).inc()
                 return None
 
         elif method == "POST":
@@ -112,6 +285,7 @@ class CryptoComClient:
                 response = requests.post(self._base_url + endpoint, params=data, headers=self._headers)
             except Exception as e:
                 logger.error("Connection error while making %s request to %s: %s", method, endpoint, e)
+                REST_ERRORS.labels(method, endpoint).inc()
                 return None
 
         elif method == "DELETE":
@@ -119,13 +293,17 @@ class CryptoComClient:
                 response = requests.delete(self._base_url + endpoint, params=data, headers=self._headers)
             except Exception as e:
                 logger.error("Connection error while making %s request to %s: %s", method, endpoint, e)
+                REST_ERRORS.labels(method, endpoint).inc()
                 return None
         else:
             raise ValueError()
 
+        REST_LATENCY.labels(method, endpoint).observe(time.perf_counter() - start)
+
         if response.status_code == 200:  # 200 is the response code of successful requests
             return response.json()
         else:
+            REST_ERRORS.labels(method, endpoint).inc()
             logger.error("Error while making %s request to %s: %s (error code %s)",
                          method, endpoint, response.json(), response.status_code)
             return None
@@ -150,32 +328,39 @@ class CryptoComClient:
 
         return collections.OrderedDict(sorted(contracts.items()))  # Sort keys of the dictionary alphabetically
 
-    def get_historical_candles(self, contract: Contract, interval: str) -> typing.List[Candle]:
+    def get_historical_candles(self, contract: Contract, interval: str, start_time: typing.Optional[int] = None,
+                               end_time: typing.Optional[int] = None, limit: int = 1000) -> typing.List[Candle]:
 
         """
         Get a list of the most recent candlesticks for a given instrument_name/contract and interval.
+        Use start_time and end_time to get older pages, the CandleStore takes care of the pagination.
         :param contract:
         :param interval: 1m, 3m, 5m, 15m, 30m, 1h, 2h, 4h, 6h, 8h, 12h, 1d, 3d, 1w, 1M
+        :param start_time: Unix timestamp in milliseconds of the first candlestick of the page
+        :param end_time: Unix timestamp in milliseconds of the last candlestick of the page
+        :param limit: Number of candlesticks of the page
         :return:
         """
 
         data = dict()
         data['instrument_name'] = contract.instrument_name
         data['interval'] = interval
-        data['limit'] = 1000  # The maximum number of candles is 1000 on CryptoCom Spot
+        data['limit'] = min(limit, 1000)  # The maximum number of candles is 1000 on CryptoCom Spot
+
+        if start_time is not None:
+            data['start_ts'] = start_time
+        if end_time is not None:
+            data['end_ts'] = end_time
 
         if self.cryptocom:
             raw_candles = self._make_request("GET", "/v2/public/get-candles", data)
         else:
             raw_candles = self._make_request("GET", "/v2/public/get-candles", data)
 
-        candles = []
-
-        if raw_candles is not None:
-            for c in raw_candles:
-                candles.append(Candle(c, interval, self.platform))
+        if raw_candles is None:
+            return []
 
-        return candles
+        return Candle.bulk(raw_candles, interval, self.platform)
 
     def get_bid_ask(self, contract: Contract) -> typing.Dict[str, float]:
 
@@ -201,6 +386,8 @@ class CryptoComClient:
                 self.prices[contract.instrument_name]['bids'] = float(ob_data['bidPrice'])
                 self.prices[contract.instrument_name]['asks'] = float(ob_data['askPrice'])
 
+            self.updates.notify("prices", contract.instrument_name)
+
             return self.prices[contract.instrument_name]
 
     def get_balances(self) -> typing.Dict[str, Balance]:
@@ -231,6 +418,18 @@ class CryptoComClient:
 
         return balances
 
+    def _reconcile_balances(self):
+
+        """
+        Periodically refresh self.balances from the exchange, called by the scheduler.
+        :return:
+        """
+
+        balances = self.get_balances()
+
+        if len(balances) > 0:  # An empty dictionary means that the request failed
+            self.balances = balances
+
     def place_order(self, contract: Contract, order_type: str, quantity: float, side: str, price=None, tif=None) -> OrderStatus:
 
         """
@@ -250,6 +449,13 @@ class CryptoComClient:
         data['quantity'] = round(int(quantity / contract.lot_size) * contract.lot_size, 8)  # int() to round down
         data['type'] = order_type.upper()  # Makes sure the order type is in uppercase
 
+        rejection = self.risk.check_order(contract, side, data['quantity'], price, self._mid_price(contract))
+        if rejection is not None:
+            self._add_log(f"{side.capitalize()} order on {contract.symbol} rejected by the risk checks: {rejection}",
+                          "WARNING")
+            ORDERS.labels("rejected").inc()
+            return None
+
         if price is not None:
             data['prices'] = round(round(price / contract.tick_size) * contract.tick_size, 8)
             data['prices'] = '%.*f' % (contract.price_decimals, data['prices'])  # Avoids scientific notation
@@ -275,8 +481,34 @@ class CryptoComClient:
 
             order_status = OrderStatus(order_status, self.platform)
 
+            ORDERS.labels(order_status.status).inc()
+
+            self.journal.record_order(contract, order_type, side, order_status)
+
+            if order_status.status == "filled":
+                self.risk.on_fill(contract, side, order_status.executed_qty, order_status.avg_price)
+            else:
+                self._unfilled_orders[order_status.order_id] = (contract, order_type, side)
+        else:
+            ORDERS.labels("failed").inc()
+
         return order_status
 
+    def _mid_price(self, contract: Contract) -> typing.Optional[float]:
+
+        """
+        Current mid price of an instrument from the latest order book update, used as the reference of the risk checks.
+        :param contract:
+        :return: None if no price was received yet
+        """
+
+        prices = self.prices.get(contract.instrument_name)
+
+        if prices is None or prices['bids'] is None or prices['asks'] is None:
+            return None
+
+        return (prices['bids'] + prices['asks']) / 2
+
     def cancel_order(self, contract: Contract, order_id: int) -> OrderStatus:
 
         data = dict()
@@ -355,6 +587,12 @@ class CryptoComClient:
 
             order_status = OrderStatus(order_status, self.platform)
 
+            if order_status.status in FINAL_ORDER_STATUSES and order_id in self._unfilled_orders:
+                order_contract, order_type, side = self._unfilled_orders.pop(order_id)
+                if order_status.executed_qty > 0:  # Also the part filled of a cancelled order
+                    self.risk.on_fill(order_contract, side, order_status.executed_qty, order_status.avg_price)
+                self.journal.record_order(order_contract, order_type, side, order_status)
+
         return order_status
 
     def _start_ws(self):
@@ -371,6 +609,7 @@ class CryptoComClient:
             try:
                 if self.reconnect:  # Reconnect unless the interface is closed by the user
                     self.ws.run_forever()  # Blocking method that ends only if the websocket connection drops
+                    WS_RECONNECTS.inc()
                 else:
                     break
             except Exception as e:
@@ -424,6 +663,14 @@ class CryptoComClient:
             data['e'] = "bookTicker"  # For CryptoCom Spot, to make the data structure uniform with CryptoCom cryptocom
             # See the data structure difference here: https://CryptoCom-docs.github.io/apidocs/spot/en/#individual-instrument_name-book-ticker-streams
 
+        if "e" in data:
+            channel = data['e']
+        elif isinstance(data.get('result'), dict):
+            channel = data['result'].get('channel', "other")
+        else:
+            channel = data.get('method', "other")  # Heartbeats, subscription responses...
+        WS_MESSAGES.labels(channel).inc()
+
         if "e" in data:
             if data['e'] == "bookTicker":
 
@@ -435,27 +682,58 @@ class CryptoComClient:
                     self.prices[instrument_name]['bids'] = float(data['b'])
                     self.prices[instrument_name]['asks'] = float(data['a'])
 
+                self.updates.notify("prices", instrument_name)
+
                 # PNL Calculation
 
                 try:
-                    for b_index, strat in self.strategies.items():
+                    for b_index, strat in list(self.strategies.items()):
                         if strat.contract.instrument_name == instrument_name:
                             for trade in strat.trades:
                                 if trade.status == "open" and trade.entry_price is not None:
                                     if trade.side == "long":
-                                        trade.pnl = (self.prices[instrument_name]['bids'] - trade.entry_price) * trade.quantity
+                                        pnl = (self.prices[instrument_name]['bids'] - trade.entry_price) * trade.quantity
                                     elif trade.side == "short":
-                                        trade.pnl = (trade.entry_price - self.prices[instrument_name]['asks']) * trade.quantity
+                                        pnl = (trade.entry_price - self.prices[instrument_name]['asks']) * trade.quantity
+                                    else:
+                                        continue
+
+                                    if pnl != trade.pnl:
+                                        trade.pnl = pnl
+                                        self.mark_trade_dirty(trade)
                 except RuntimeError as e:  # Handles the case  the dictionary is modified while loop through it
                     logger.error("Error while looping through the CryptoCom strategies: %s", e)
 
             if data['e'] == "aggTrade":
 
+                # Same path as the trade batches, so that the live trades go through parse_trades_batch() too
+
                 instrument_name = data['s']
+                trades = [(float(data['p']), float(data['q']), data['t'])]
 
-                for key, strat in self.strategies.items():
+                if self.workers is not None:
+                    self.workers.publish(instrument_name, trades)
+
+                for key, strat in list(self.strategies.items()):
                     if strat.contract.instrument_name == instrument_name:
-                        res = strat.parse_trades(float(data['p']), float(data['q']), data['t'])  # Updates candlesticks
+                        res = strat.parse_trades_batch(trades)  # Updates candlesticks and checks the TP/SL
+                        if not strat.remote_signals:
+                            strat.check_trade(res)
+
+        elif "result" in data and data['result'].get('channel') == "trade":
+
+            # Crypto.com pushes the trades in batches, so they are parsed in one pass instead of one by one
+
+            instrument_name = data['result']['instrument_name']
+            trades = [(float(t['p']), float(t['q']), t['t']) for t in data['result']['data']]
+
+            if self.workers is not None:
+                self.workers.publish(instrument_name, trades)
+
+            for key, strat in list(self.strategies.items()):
+                if strat.contract.instrument_name == instrument_name:
+                    res = strat.parse_trades_batch(trades)  # Updates candlesticks and checks the TP/SL
+                    if not strat.remote_signals:
                         strat.check_trade(res)
 
     def subscribe_channel(self, contracts: typing.List[Contract], channel: str, reconnection=False):
@@ -518,9 +796,9 @@ class CryptoComClient:
         if balance is not None:
             if contract.quote_asset in balance:  # On CryptoCom Spot, the quote asset isn't necessarily USDT
                 if self.cryptocom:
-                    balance = balance[contract.quote_ccy].wallet_balance
+                    balance = balance[contract.quote_asset].wallet_balance
                 else:
-                    balance = balance[contract.quote_ccy].free
+                    balance = balance[contract.quote_asset].free
             else:
                 return None
         else:
@@ -530,7 +808,7 @@ class CryptoComClient:
 
         trade_size = round(round(trade_size / contract.lot_size) * contract.lot_size, 8)  # Removes extra decimals
 
-        logger.info("CryptoCom current %s balance = %s, trade size = %s", contract.quote_ccy, balance, trade_size)
+        logger.info("CryptoCom current %s balance = %s, trade size = %s", contract.quote_asset, balance, trade_size)
 
         return trade_size
 
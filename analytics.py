@@ -0,0 +1,153 @@
+import collections
+import threading
+import typing
+
+from models import *
+from retention import TRIM_SLACK
+
+if typing.TYPE_CHECKING:
+    from journal import TradeJournal
+
+
+# Bucket sizes of the realized PnL rollups, in milliseconds
+GRANULARITIES = {"hourly": 3600 * 1000, "daily": 24 * 3600 * 1000}
+
+
+class _Rollup:
+    __slots__ = ("pnl", "trades", "wins", "hold_time")
+
+    def __init__(self):
+        self.pnl = 0.0
+        self.trades = 0
+        self.wins = 0
+        self.hold_time = 0  # Sum of the holding times in milliseconds
+
+    def add(self, pnl: float, hold_time: int):
+        self.pnl += pnl
+        self.trades += 1
+        self.wins += 1 if pnl > 0 else 0
+        self.hold_time += hold_time
+
+
+class PnlAnalytics:
+    def __init__(self, max_buckets: int = 720):
+
+        """
+        Performance rollups of the closed trades, per strategy and instrument: realized PnL, win rate and holding
+        time per hourly/daily bucket and in total, plus the drawdown of the cumulative realized PnL.
+        They are updated incrementally when a trade closes, so the queries cost O(buckets) instead of a rescan of the
+        trade history.
+        :param max_buckets: Most recent buckets kept per granularity, strategy and instrument, the totals and
+        drawdowns still include the older ones
+        """
+
+        self._max_buckets = max_buckets
+
+        self._lock = threading.Lock()  # Updated from the websocket thread, read from the UI thread
+
+        # (granularity, strategy, instrument) -> bucket start -> rollup
+        self._buckets: typing.Dict[typing.Tuple[str, str, str], typing.Dict[int, _Rollup]] = \
+            collections.defaultdict(dict)
+
+        self._totals: typing.Dict[typing.Tuple[str, str], _Rollup] = collections.defaultdict(_Rollup)
+
+        # (strategy, instrument) -> [cumulative PnL, peak of the cumulative PnL, maximum drawdown]
+        self._drawdowns: typing.Dict[typing.Tuple[str, str], typing.List[float]] = \
+            collections.defaultdict(lambda: [0.0, 0.0, 0.0])
+
+    def load(self, journal: "TradeJournal"):
+
+        """
+        Build the rollups from the closed trades of the journal, once at startup.
+        They are replayed in the order they were closed, like when they are added live, so that the drawdown is the
+        same after a restart.
+        :param journal:
+        :return:
+        """
+
+        for row in journal.get_trades(status="closed", order_by="close_time"):
+            if row['close_time'] is not None:
+                self._add(row['strategy'], row['instrument'], row['pnl'], row['open_time'], row['close_time'])
+
+    def on_trade_closed(self, trade: Trade):
+        self._add(trade.strategy, trade.contract.symbol, trade.pnl, trade.time, trade.close_time)
+
+    def _add(self, strategy: str, instrument: str, pnl: float, open_time: int, close_time: int):
+        with self._lock:
+            for granularity, size in GRANULARITIES.items():
+                buckets = self._buckets[(granularity, strategy, instrument)]
+                bucket_start = close_time - close_time % size
+
+                if bucket_start not in buckets:
+                    buckets[bucket_start] = _Rollup()
+                buckets[bucket_start].add(pnl, close_time - open_time)
+
+                if len(buckets) > self._max_buckets + TRIM_SLACK:  # Drop the oldest buckets, by chunks
+                    for old_start in sorted(buckets)[:len(buckets) - self._max_buckets]:
+                        del buckets[old_start]
+
+            self._totals[(strategy, instrument)].add(pnl, close_time - open_time)
+
+            drawdown = self._drawdowns[(strategy, instrument)]
+            drawdown[0] += pnl
+            drawdown[1] = max(drawdown[1], drawdown[0])
+            drawdown[2] = max(drawdown[2], drawdown[1] - drawdown[0])
+
+    def summary(self, strategy: typing.Optional[str] = None,
+                instrument: typing.Optional[str] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+
+        """
+        Totals per strategy and instrument.
+        :param strategy: Filter, all the strategies if None
+        :param instrument: Filter, all the instruments if None
+        :return: A list of dictionaries with the pnl, trades, win_rate, avg_hold_time (seconds) and max_drawdown keys
+        """
+
+        result = []
+
+        with self._lock:
+            for (strat, instr), total in sorted(self._totals.items()):
+                if (strategy is not None and strat != strategy) or (instrument is not None and instr != instrument):
+                    continue
+
+                result.append({"strategy": strat, "instrument": instr, "pnl": total.pnl, "trades": total.trades,
+                               "win_rate": total.wins / total.trades * 100,
+                               "avg_hold_time": total.hold_time / total.trades / 1000,
+                               "max_drawdown": self._drawdowns[(strat, instr)][2]})
+
+        return result
+
+    def series(self, granularity: str, strategy: typing.Optional[str] = None,
+               instrument: typing.Optional[str] = None, start: typing.Optional[int] = None,
+               end: typing.Optional[int] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+
+        """
+        Realized PnL per time bucket, summed over the strategies and instruments matching the filters.
+        :param granularity: hourly or daily
+        :param strategy: Filter, all the strategies if None
+        :param instrument: Filter, all the instruments if None
+        :param start: Unix timestamp in milliseconds, minimum bucket start
+        :param end: Unix timestamp in milliseconds, maximum bucket start
+        :return: A list of dictionaries with the time, pnl, trades and win_rate keys, ordered by time
+        """
+
+        merged: typing.Dict[int, _Rollup] = collections.defaultdict(_Rollup)
+
+        with self._lock:
+            for (gran, strat, instr), buckets in self._buckets.items():
+                if gran != granularity or (strategy is not None and strat != strategy) or \
+                        (instrument is not None and instr != instrument):
+                    continue
+
+                for bucket_start, rollup in buckets.items():
+                    if (start is not None and bucket_start < start) or (end is not None and bucket_start > end):
+                        continue
+
+                    bucket = merged[bucket_start]
+                    bucket.pnl += rollup.pnl
+                    bucket.trades += rollup.trades
+                    bucket.wins += rollup.wins
+                    bucket.hold_time += rollup.hold_time
+
+        return [{"time": bucket_start, "pnl": rollup.pnl, "trades": rollup.trades,
+                 "win_rate": rollup.wins / rollup.trades * 100} for bucket_start, rollup in sorted(merged.items())]
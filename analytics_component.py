@@ -0,0 +1,75 @@
+import tkinter as tk
+import datetime
+import time
+
+from styling import *
+from analytics import PnlAnalytics
+
+
+class AnalyticsPanel(tk.Frame):
+    def __init__(self, analytics: PnlAnalytics, *args, **kwargs):
+
+        """
+        Performance summary per strategy and instrument, and the realized PnL of the last days.
+        The data comes from the precomputed rollups, so refreshing the panel doesn't scan the trade history.
+        """
+
+        super().__init__(*args, **kwargs)
+
+        self._analytics = analytics
+
+        self._summary_headers = ["strategy", "instrument", "pnl", "trades", "win_rate", "avg_hold_time",
+                                 "max_drawdown"]
+        self._daily_headers = ["time", "pnl", "trades", "win_rate"]
+
+        self._col_width = 12
+
+        self._summary_frame = tk.Frame(self, bg=BG_COLOR)
+        self._summary_frame.pack(side=tk.TOP, pady=10)
+
+        self._daily_label = tk.Label(self, text="Last 7 days", bg=BG_COLOR, fg=FG_COLOR, font=BOLD_FONT)
+        self._daily_label.pack(side=tk.TOP)
+
+        self._daily_frame = tk.Frame(self, bg=BG_COLOR)
+        self._daily_frame.pack(side=tk.TOP, pady=10)
+
+        self._refresh_button = tk.Button(self, text="Refresh", font=GLOBAL_FONT, command=self.refresh, bg=BG_COLOR_2,
+                                         fg=FG_COLOR)
+        self._refresh_button.pack(side=tk.TOP, pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+
+        """
+        Rebuild both tables from the current rollups.
+        :return:
+        """
+
+        summary = self._analytics.summary()
+
+        daily = self._analytics.series("daily", start=int(time.time() * 1000) - 7 * 24 * 3600 * 1000)
+        for bucket in daily:
+            bucket['time'] = datetime.datetime.utcfromtimestamp(bucket['time'] / 1000).strftime("%b %d")
+
+        self._fill_table(self._summary_frame, self._summary_headers, summary)
+        self._fill_table(self._daily_frame, self._daily_headers, daily)
+
+    def _fill_table(self, frame: tk.Frame, headers, rows):
+        for widget in frame.winfo_children():
+            widget.destroy()
+
+        for col, h in enumerate(headers):
+            header = tk.Label(frame, text=h.replace("_", " ").capitalize(), bg=BG_COLOR, fg=FG_COLOR,
+                              font=BOLD_FONT, width=self._col_width)
+            header.grid(row=0, column=col)
+
+        for row_nb, row in enumerate(rows, start=1):
+            for col, h in enumerate(headers):
+                value = row[h]
+                if isinstance(value, float):
+                    value = "{0:.2f}".format(value)
+
+                label = tk.Label(frame, text=value, bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT,
+                                 width=self._col_width)
+                label.grid(row=row_nb, column=col)
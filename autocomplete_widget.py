@@ -1,9 +1,10 @@
 import tkinter as tk
-import typing
+
+from symbol_index import SymbolIndex
 
 
 class Autocomplete(tk.Entry):
-    def __init__(self, symbols: typing.List[str], *args, **kwargs):
+    def __init__(self, symbols: SymbolIndex, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._symbols = symbols
@@ -42,8 +43,8 @@ class Autocomplete(tk.Entry):
 
                 self._lb_open = True
 
-            # Finds symbols that start with the characters that you typed in the tk.Entry widget
-            symbols_matched = [symbol for symbol in self._symbols if symbol.startswith(self._var.get())]
+            # Finds the first 8 symbols matching the characters that you typed in the tk.Entry widget
+            symbols_matched = self._symbols.search(self._var.get(), limit=8)
 
             if len(symbols_matched) > 0:
 
@@ -52,7 +53,7 @@ class Autocomplete(tk.Entry):
                 except tk.TclError:
                     pass
 
-                for symbol in symbols_matched[:8]:  # Takes only the first 8 elements of the list to match the Listbox
+                for symbol in symbols_matched:  # 8 elements at most to match the Listbox
                     self._lb.insert(tk.END, symbol)
 
             else:  # If no match, closes the Listbox if it was open
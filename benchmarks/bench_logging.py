@@ -0,0 +1,124 @@
+"""
+Logging cost on the thread that logs, e.g. the websocket thread for each message received.
+Compares the former synchronous handlers (terminal + info.log written by the calling thread) with the queue-based
+setup of log_config.py, in text and JSON lines format.
+The slow disk cases add a simulated 100 us stall to every file write, like a busy or network volume.
+Run from the repository root: python -m benchmarks.bench_logging
+"""
+
+import contextlib
+import logging
+import os
+import tempfile
+import time
+
+from log_config import setup_logging
+
+
+N_RECORDS = 50_000
+DISK_STALL = 0.0001  # Seconds
+
+
+def sync_handlers(path: str, stream):
+
+    """
+    Handlers as configured in main.py before the queue-based logging.
+    """
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter('%(asctime)s %(levelname)s :: %(message)s')
+
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(logging.INFO)
+
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(logging.DEBUG)
+
+    logger.addHandler(stream_handler)
+    logger.addHandler(file_handler)
+
+    return None
+
+
+@contextlib.contextmanager
+def slow_disk(stall: float):
+
+    """
+    Make every file write wait, FileHandler.emit() is also the one used by the rotating handlers.
+    """
+
+    emit = logging.FileHandler.emit
+
+    def slow_emit(handler, record):
+        time.sleep(stall)
+        emit(handler, record)
+
+    logging.FileHandler.emit = slow_emit
+    try:
+        yield
+    finally:
+        logging.FileHandler.emit = emit
+
+
+def measure(setup, n: int):
+
+    """
+    :return: (microseconds per record on the logging thread, seconds until everything is written)
+    """
+
+    logger = logging.getLogger()
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        listener = setup(os.path.join(tmp, "info.log"), devnull)
+
+        start = time.perf_counter()
+
+        for i in range(n):
+            if i % 10 == 0:
+                logger.info("CryptoCom: subscribing to: %s", "btcusdt@aggTrade")
+            else:
+                logger.debug("%s %s: %s milliseconds of difference between the current time and the trade time",
+                             "CryptoCom", "BTC_USDT", i)
+
+        elapsed = time.perf_counter() - start
+
+        if listener is not None:
+            listener.stop()  # Waits for the listener thread to write the queued records
+
+        total = time.perf_counter() - start
+
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+    return elapsed / n * 1_000_000, total
+
+
+def run(n: int = N_RECORDS):
+    # No deduplication: it would drop most of the repeated records of measure() and only time the filter
+    queue_text = lambda path, stream: setup_logging(path, stream=stream, dedup_window=None)
+    queue_json_lines = lambda path, stream: setup_logging(path, json_lines=True, stream=stream, dedup_window=None)
+
+    results = {
+        "sync_file_handler": measure(sync_handlers, n),
+        "queue_text": measure(queue_text, n),
+        "queue_json_lines": measure(queue_json_lines, n),
+    }
+
+    with slow_disk(DISK_STALL):
+        results["sync_file_handler_slow_disk"] = measure(sync_handlers, n // 10)
+        results["queue_text_slow_disk"] = measure(queue_text, n // 10)
+
+    return {name: {"us_per_record": round(us, 2), "seconds_until_written": round(total, 3)}
+            for name, (us, total) in results.items()}
+
+
+if __name__ == '__main__':
+    print(f"{N_RECORDS} records")
+    for name, result in run().items():
+        print(f"{name:<30} {result['us_per_record']:>8} us/record on the logging thread "
+              f"{result['seconds_until_written']:>8} s until written")
@@ -0,0 +1,90 @@
+"""
+Memory footprint and construction time of the Candle model.
+Run from the repository root: python -m benchmarks.bench_models
+"""
+
+import random
+import time
+import tracemalloc
+
+from models import Candle
+
+
+N_CANDLES = 100_000
+
+
+class DictCandle:
+
+    """
+    Reference dict-backed model, equivalent to Candle before __slots__ were added.
+    """
+
+    def __init__(self, candle_info, timeframe, exchange):
+        if exchange in ["crypto_com"]:
+            self.timestamp = candle_info[0]
+            self.open = float(candle_info[1])
+            self.high = float(candle_info[2])
+            self.low = float(candle_info[3])
+            self.close = float(candle_info[4])
+            self.volume = float(candle_info[5])
+
+
+def make_payload(n: int):
+
+    """
+    Synthetic get-candles REST payload, prices as strings like the exchange sends them.
+    """
+
+    rng = random.Random(42)
+    price = 30000.0
+    payload = []
+
+    for i in range(n):
+        price += rng.gauss(0, 10)
+        payload.append([1_600_000_000_000 + i * 60_000, f"{price:.2f}", f"{price + 5:.2f}", f"{price - 5:.2f}",
+                        f"{price + 1:.2f}", f"{rng.random() * 10:.4f}"])
+
+    return payload
+
+
+def measure(build, payload, repeat: int = 3):
+
+    """
+    Time and memory are measured in separate passes, tracemalloc slowing down the allocations a lot.
+    :return: (bytes per candle, best construction time in seconds)
+    """
+
+    elapsed = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        candles = build(payload)
+        elapsed = min(elapsed, time.perf_counter() - start)
+        del candles
+
+    tracemalloc.start()
+    candles = build(payload)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(candles) == len(payload)
+
+    return current / len(payload), elapsed
+
+
+def run(n: int = N_CANDLES):
+    payload = make_payload(n)
+
+    results = {
+        "dict_per_instance": measure(lambda p: [DictCandle(c, "1m", "crypto_com") for c in p], payload),
+        "slots_per_instance": measure(lambda p: [Candle(c, "1m", "crypto_com") for c in p], payload),
+        "slots_bulk": measure(lambda p: Candle.bulk(p, "1m", "crypto_com"), payload),
+    }
+
+    return {name: {"bytes_per_candle": round(b, 1), "seconds": round(t, 4)} for name, (b, t) in results.items()}
+
+
+if __name__ == '__main__':
+    print(f"{N_CANDLES} candles")
+    for name, result in run().items():
+        print(f"{name:<20} {result['bytes_per_candle']:>8} bytes/candle {result['seconds'] * 1000:>10.1f} ms")
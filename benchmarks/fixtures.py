@@ -0,0 +1,105 @@
+"""
+Synthetic, reproducible market data for the benchmarks: the same seed always gives the same prices and sizes.
+Timestamps start at the base timestamp given by the caller, the strategies warning about trades older than 2 seconds.
+"""
+
+import json
+import random
+import typing
+
+from models import Candle
+
+
+SEED = 42
+TF_1M = 60_000  # 1m timeframe in milliseconds
+
+
+def instruments_payload(n: int) -> typing.Dict:
+
+    """
+    Response of the get-instruments REST endpoint with n instruments.
+    """
+
+    rng = random.Random(SEED)
+    quotes = ["USDT", "USD", "BTC", "CRO"]
+
+    instruments = []
+
+    for i in range(n):
+        base = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)) + str(i)
+        quote = quotes[i % len(quotes)]
+        instruments.append({"instrument_name": f"{base}_{quote}", "base_currency": base, "quote_currency": quote,
+                            "quote_decimals": rng.randint(2, 8), "quantity_decimals": rng.randint(0, 6),
+                            "price_tick_size": rng.randint(2, 8), "qty_tick_size": rng.randint(0, 6)})
+
+    return {"instrument_name": instruments}
+
+
+def candles(n: int, end_timestamp: int, price: float = 30000.0) -> typing.List[Candle]:
+
+    """
+    n consecutive 1m candles, the last one opening at end_timestamp.
+    """
+
+    rng = random.Random(SEED)
+    result = []
+
+    for i in range(n):
+        close = price + rng.gauss(0, 10)
+        result.append(Candle.from_values(end_timestamp - (n - 1 - i) * TF_1M, price, max(price, close) + 2,
+                                         min(price, close) - 2, close, rng.random() * 10))
+        price = close
+
+    return result
+
+
+def trade_ticks(n: int, start_timestamp: int, spacing_ms: int = 10,
+                price: float = 30000.0) -> typing.List[typing.Tuple[float, float, int]]:
+
+    """
+    n public trades as (price, size, timestamp), spacing_ms apart.
+    """
+
+    rng = random.Random(SEED)
+    ticks = []
+
+    for i in range(n):
+        price += rng.gauss(0, 0.5)
+        ticks.append((round(price, 2), round(rng.random(), 4), start_timestamp + i * spacing_ms))
+
+    return ticks
+
+
+def trade_frames(instrument: str, n_frames: int, trades_per_frame: int, start_timestamp: int,
+                 spacing_ms: int = 10) -> typing.List[str]:
+
+    """
+    Websocket messages of the trade channel, trades being pushed in batches like Crypto.com does.
+    """
+
+    ticks = trade_ticks(n_frames * trades_per_frame, start_timestamp, spacing_ms)
+    frames = []
+
+    for f in range(n_frames):
+        batch = ticks[f * trades_per_frame:(f + 1) * trades_per_frame]
+        frames.append(json.dumps({"result": {"channel": "trade", "instrument_name": instrument,
+                                             "data": [{"p": str(p), "q": str(q), "t": t} for p, q, t in batch]}}))
+
+    return frames
+
+
+def book_frames(instrument: str, n: int, price: float = 30000.0) -> typing.List[str]:
+
+    """
+    Websocket messages of the best bid/ask.
+    """
+
+    rng = random.Random(SEED)
+    frames = []
+
+    for i in range(n):
+        price += rng.gauss(0, 0.5)
+        frames.append(json.dumps({"e": "bookTicker", "s": instrument, "b": f"{price - 0.5:.2f}",
+                                  "a": f"{price + 0.5:.2f}"}))
+
+    return frames
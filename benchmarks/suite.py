@@ -0,0 +1,377 @@
+"""
+Benchmarks of the connector and strategy hot paths, on the synthetic data of benchmarks/fixtures.py.
+The client is built without its constructor: no REST call, websocket or scheduler thread, and the REST requests of
+place_order() and get_contracts() return canned responses, so only the local processing is measured.
+
+Run from the repository root:
+    python -m benchmarks.suite                                  # Writes benchmarks/results.json
+    python -m benchmarks.suite --baseline old.json              # Exit code 1 if a benchmark got slower
+    python -m benchmarks.suite --filter strategy --repeat 10
+
+Each benchmark is timed --repeat times on a fresh state and the best time is kept, in microseconds per operation.
+A benchmark whose dependencies are missing is reported as skipped.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import typing
+
+from benchmarks import fixtures
+
+
+SYMBOL = "BTC_USDT"
+BREAKOUT_PARAMS = {"min_volume": 1e18}  # Never met, so that no order is placed during the benchmarks
+TECHNICAL_PARAMS = {"rsi_length": 14, "ema_fast": 12, "ema_slow": 26, "ema_signal": 9}
+NO_RISK_LIMITS = {"max_orders_per_sec": None, "price_band_pct": None}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def make_client(tmp: str):
+
+    """
+    CryptoComClient with the state used by the hot paths, without calling its constructor.
+    """
+
+    from CryptoCom import CryptoComClient
+    from models import Contract
+    from risk import RiskEngine
+    from journal import TradeJournal
+    from update_bus import UpdateBus
+    from retention import DEFAULT_RETENTION
+
+    contract = Contract({"instrument_name": SYMBOL, "base_currency": "BTC", "quote_currency": "USDT",
+                         "quote_decimals": 2, "quantity_decimals": 6, "price_tick_size": 2, "qty_tick_size": 6},
+                        "crypto_com")
+
+    client = CryptoComClient.__new__(CryptoComClient)
+    client.cryptocom = True
+    client.platform = "crypto_com"
+    client.retention = dict(DEFAULT_RETENTION)
+    client._secret_key = "0" * 64
+    client.contracts = {SYMBOL: contract}
+    client.prices = dict()
+    client.updates = UpdateBus()
+    client._dirty_trades = dict()
+    client._dirty_lock = threading.Lock()
+    client.risk = RiskEngine(NO_RISK_LIMITS)
+    client.journal = TradeJournal(os.path.join(tmp, "journal.db"))
+    client._unfilled_orders = dict()
+    client.strategies = dict()
+    client.workers = None
+    client.logs = collections.deque(maxlen=500)
+    client.log_queue = collections.deque(maxlen=1000)
+
+    return client
+
+
+def make_strategy(client, strategy_type: str = "Breakout", n_candles: int = 1000, start_timestamp: int = None):
+    from strategies import TechnicalStrategy, BreakoutStrategy
+
+    contract = client.contracts[SYMBOL]
+
+    if strategy_type == "Technical":
+        strategy = TechnicalStrategy(client, contract, "CryptoCom", "1m", 10, 2, 2, TECHNICAL_PARAMS)
+    else:
+        strategy = BreakoutStrategy(client, contract, "CryptoCom", "1m", 10, 2, 2, BREAKOUT_PARAMS)
+
+    # The last candle opens at the first trade of the fixtures
+    strategy.candles = fixtures.candles(n_candles, start_timestamp if start_timestamp is not None else _now_ms())
+
+    return strategy
+
+
+def add_open_trades(strategy, n: int, price: float = 30000.0):
+
+    """
+    Open trades whose take profit and stop loss (50 %) are far from the fixture prices.
+    """
+
+    from models import Trade
+
+    for i in range(n):
+        trade = Trade({"time": _now_ms(), "contract": strategy.contract, "strategy": strategy.strat_name,
+                       "side": "long" if i % 2 == 0 else "short", "entry_price": price * (1 + (i % 10 - 5) / 1000),
+                       "status": "open", "pnl": 0, "quantity": 0.01, "entry_id": i})
+        strategy.trades.append(trade)
+        strategy._triggers.add(trade, 50, 50)
+
+
+# Each benchmark sets up a fresh state in tmp and returns the operation to time and the number of ops it performs
+
+def bench_on_message_trades(tmp: str):
+    client = make_client(tmp)
+    start = _now_ms()
+    client.strategies[0] = make_strategy(client, start_timestamp=start)
+    frames = fixtures.trade_frames(SYMBOL, 2000, 20, start)
+
+    def op():
+        for frame in frames:
+            client._on_message(None, frame)
+
+    return op, len(frames)
+
+
+def bench_on_message_book(tmp: str):
+    client = make_client(tmp)
+    strategy = make_strategy(client)
+    add_open_trades(strategy, 5)
+    client.strategies[0] = strategy
+    frames = fixtures.book_frames(SYMBOL, 20000)
+
+    def op():
+        for frame in frames:
+            client._on_message(None, frame)
+
+    return op, len(frames)
+
+
+def bench_parse_trades(tmp: str):
+    client = make_client(tmp)
+    start = _now_ms()
+    strategy = make_strategy(client, start_timestamp=start)
+    ticks = fixtures.trade_ticks(50000, start)
+
+    def op():
+        for price, size, timestamp in ticks:
+            strategy.parse_trades(price, size, timestamp)
+
+    return op, len(ticks)
+
+
+def bench_check_tp_sl(tmp: str):
+    client = make_client(tmp)
+    strategy = make_strategy(client)
+    add_open_trades(strategy, 200)
+    prices = [p for p, s, t in fixtures.trade_ticks(50000, _now_ms())]
+
+    def op():
+        for price in prices:
+            strategy._check_tp_sl(price)
+
+    return op, len(prices)
+
+
+def bench_technical_check_signal(tmp: str):
+    strategy = make_strategy(make_client(tmp), "Technical")
+
+    def op():
+        for _ in range(50):
+            strategy._check_signal()
+
+    return op, 50
+
+
+def bench_breakout_check_signal(tmp: str):
+    strategy = make_strategy(make_client(tmp))
+
+    def op():
+        for _ in range(100000):
+            strategy._check_signal()
+
+    return op, 100000
+
+
+def bench_place_order(tmp: str):
+    client = make_client(tmp)
+    contract = client.contracts[SYMBOL]
+    response = {"order_id": 1, "status": "NEW", "avg_price": "0", "quantity": "0"}
+    client._make_request = lambda method, endpoint, data: dict(response)
+
+    def op():
+        for i in range(5000):
+            client.place_order(contract, "LIMIT", 0.0123456789, "buy" if i % 2 == 0 else "sell", 30000.123456, "GTC")
+
+    return op, 5000
+
+
+def bench_get_contracts(tmp: str):
+    client = make_client(tmp)
+    payload = fixtures.instruments_payload(1000)
+    client._make_request = lambda method, endpoint, data: payload
+
+    def op():
+        for _ in range(20):
+            client.get_contracts()
+
+    return op, 20
+
+
+def bench_workspace_save(tmp: str):
+    from database import WorkspaceData
+
+    db = WorkspaceData(os.path.join(tmp, "workspace.db"))
+    rows = [(f"SYM{i}_USDT", "CryptoCom") for i in range(200)]
+    db.save("watchlist", rows).result()
+
+    def op():
+        for i in range(200):
+            rows[i] = (f"NEW{i}_USDT", "CryptoCom")  # One row changed per save
+            db.save("watchlist", rows).result()
+
+    return op, 200
+
+
+def bench_workspace_save_unchanged(tmp: str):
+    from database import WorkspaceData
+
+    db = WorkspaceData(os.path.join(tmp, "workspace.db"))
+    rows = [(f"SYM{i}_USDT", "CryptoCom") for i in range(200)]
+    db.save("watchlist", rows).result()
+
+    def op():
+        for _ in range(1000):
+            db.save("watchlist", rows).result()
+
+    return op, 1000
+
+
+def bench_paper_matching(tmp: str):
+    from paper_trading import MatchingEngine, SimOrder, DEFAULT_PAPER_SETTINGS
+
+    client = make_client(tmp)
+    contract = client.contracts[SYMBOL]
+    ticks = fixtures.trade_ticks(50000, _now_ms())
+
+    engine = MatchingEngine(dict(DEFAULT_PAPER_SETTINGS, latency_ms=0), lambda order, quantity, price, fee: None)
+    engine.on_book(SYMBOL, ticks[0][0] - 0.5, ticks[0][0] + 0.5, None, None, ticks[0][2])
+
+    # 500 resting limit orders around the first price, as if placed by hundreds of simulated strategies
+    for i in range(500):
+        offset = (i // 2 % 50 + 1) * 0.5
+        side = "buy" if i % 2 == 0 else "sell"
+        engine.submit(SimOrder(i, contract, side, ticks[0][0] - offset if side == "buy" else ticks[0][0] + offset,
+                               0.01))
+
+    def op():
+        for price, size, timestamp in ticks:
+            engine.on_trade(SYMBOL, price, size, None, timestamp)
+
+    return op, len(ticks)
+
+
+BENCHMARKS: typing.Dict[str, typing.Callable] = {
+    "on_message_trades": bench_on_message_trades,
+    "on_message_book": bench_on_message_book,
+    "strategy_parse_trades": bench_parse_trades,
+    "strategy_check_tp_sl": bench_check_tp_sl,
+    "technical_check_signal": bench_technical_check_signal,
+    "breakout_check_signal": bench_breakout_check_signal,
+    "place_order": bench_place_order,
+    "get_contracts": bench_get_contracts,
+    "workspace_save": bench_workspace_save,
+    "workspace_save_unchanged": bench_workspace_save_unchanged,
+    "paper_matching": bench_paper_matching,
+}
+
+
+def measure(bench: typing.Callable, repeat: int) -> typing.Dict[str, typing.Any]:
+    best = float("inf")
+    n_ops = 0
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            op, n_ops = bench(tmp)
+
+            start = time.perf_counter()
+            op()
+            best = min(best, time.perf_counter() - start)
+
+    return {"us_per_op": round(best / n_ops * 1_000_000, 3), "ops": n_ops}
+
+
+def run(repeat: int = 5, name_filter: typing.Optional[str] = None) -> typing.Dict[str, typing.Dict]:
+    results = dict()
+
+    for name, bench in BENCHMARKS.items():
+        if name_filter is not None and name_filter not in name:
+            continue
+
+        try:
+            results[name] = measure(bench, repeat)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+
+    return results
+
+
+def compare(results: typing.Dict, baseline: typing.Dict, tolerance: float) -> typing.List[str]:
+
+    """
+    :return: The benchmarks more than tolerance (a ratio) slower than in the baseline, as readable lines
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("us_per_op")
+        after = result.get("us_per_op")
+
+        if before is None or after is None:
+            continue
+
+        if after > before * (1 + tolerance):
+            regressions.append(f"{name}: {before} -> {after} us/op (+{(after / before - 1) * 100:.0f} %)")
+
+    return regressions
+
+
+def _git_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Connector and strategy benchmarks")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results.json"))
+    parser.add_argument("--baseline", help="Results file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="Only run the benchmarks whose name contains this text")
+    args = parser.parse_args()
+
+    logging.getLogger().addHandler(logging.NullHandler())  # Measures the code, not the terminal output
+
+    results = run(args.repeat, args.filter)
+
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<28} skipped: {result['skipped']}")
+        else:
+            print(f"{name:<28} {result['us_per_op']:>12.3f} us/op")
+
+    with open(args.output, "w") as f:
+        json.dump({"commit": _git_commit(), "python": sys.version.split()[0], "platform": platform.platform(),
+                   "time": int(time.time()), "results": results}, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline['results'], args.tolerance)
+
+        for line in regressions:
+            print(f"REGRESSION {line}")
+
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
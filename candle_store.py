@@ -0,0 +1,142 @@
+import logging
+import sqlite3
+import threading
+import time
+import typing
+
+from concurrent.futures import ThreadPoolExecutor
+
+from models import *
+from strategies import TF_EQUIV
+
+if typing.TYPE_CHECKING:
+    from CryptoCom import CryptoComClient
+
+
+logger = logging.getLogger()
+
+
+class CandleStore:
+    def __init__(self, client: "CryptoComClient", path: str = "candles.db", page_size: int = 1000,
+                 max_workers: int = 4):
+
+        """
+        Local SQLite cache of historical candlesticks, indexed by instrument, timeframe and timestamp.
+        Deep history is fetched once with parallel paginated requests, then only the missing tail is requested.
+        :param client: The connector used to request the missing candlesticks
+        :param path: SQLite database file
+        :param page_size: Number of candlesticks per REST request (1000 max on Crypto.com)
+        :param max_workers: Number of pages requested in parallel
+        """
+
+        self._client = client
+        self._page_size = page_size
+        self._max_workers = max_workers
+
+        self._requested_from: typing.Dict[typing.Tuple[str, str], int] = dict()  # Oldest timestamp already requested
+
+        self._lock = threading.Lock()  # The connection is shared by the UI thread and the strategies
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        # The primary key doubles as the (instrument, timeframe, ts) index
+        self.conn.execute("CREATE TABLE IF NOT EXISTS candles (instrument TEXT, timeframe TEXT, ts INTEGER, "
+                          "open REAL, high REAL, low REAL, close REAL, volume REAL, "
+                          "PRIMARY KEY (instrument, timeframe, ts)) WITHOUT ROWID")
+        self.conn.commit()
+
+    def get_candles(self, contract: Contract, timeframe: str, count: int = 1000) -> typing.List[Candle]:
+
+        """
+        Get the most recent candlesticks of an instrument, the last one being the current (incomplete) candlestick.
+        Missing candlesticks are requested first: the whole range if the cache doesn't go back far enough,
+        otherwise only from the last cached candlestick (which is refreshed as it was possibly incomplete).
+        :param contract:
+        :param timeframe: 1m, 5m, 15m, 30m, 1h, 4h
+        :param count: Number of candlesticks needed, can be above the 1000 candles limit of a single request
+        :return:
+        """
+
+        tf_ms = TF_EQUIV[timeframe] * 1000
+
+        now = int(time.time() * 1000)
+        current_ts = now - now % tf_ms
+        start_ts = current_ts - (count - 1) * tf_ms
+
+        first_ts, last_ts = self._cached_range(contract.symbol, timeframe)
+
+        # The exchange may have less history than requested (recent listing): only request the deep history once
+        requested_from = self._requested_from.get((contract.symbol, timeframe), current_ts)
+
+        if first_ts is None or (first_ts > start_ts and requested_from > start_ts):
+            self._fetch(contract, timeframe, start_ts, current_ts)
+            self._requested_from[(contract.symbol, timeframe)] = start_ts
+        else:
+            self._fetch(contract, timeframe, last_ts, current_ts)
+
+        return self.get_range(contract.symbol, timeframe, start_ts, current_ts)
+
+    def get_range(self, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> typing.List[Candle]:
+
+        """
+        Read cached candlesticks only, without any request to the exchange. Meant for backtests.
+        :param symbol:
+        :param timeframe:
+        :param start_ts: Unix timestamp in milliseconds, inclusive
+        :param end_ts: Unix timestamp in milliseconds, inclusive
+        :return:
+        """
+
+        with self._lock:
+            rows = self.conn.execute("SELECT ts, open, high, low, close, volume FROM candles "
+                                     "WHERE instrument = ? AND timeframe = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                                     (symbol, timeframe, start_ts, end_ts)).fetchall()
+
+        return Candle.bulk(rows, timeframe, "crypto_com")
+
+    def _cached_range(self, symbol: str, timeframe: str) -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(ts), MAX(ts) FROM candles WHERE instrument = ? AND timeframe = ?",
+                                    (symbol, timeframe)).fetchone()
+
+        return row[0], row[1]
+
+    def _fetch(self, contract: Contract, timeframe: str, start_ts: int, end_ts: int):
+
+        """
+        Request the candlesticks of a time range, split in pages requested in parallel, and save them.
+        :param contract:
+        :param timeframe:
+        :param start_ts: Unix timestamp in milliseconds of the first candlestick
+        :param end_ts: Unix timestamp in milliseconds of the last candlestick
+        :return:
+        """
+
+        tf_ms = TF_EQUIV[timeframe] * 1000
+        page_ms = self._page_size * tf_ms
+
+        pages = [(page_start, min(page_start + page_ms - tf_ms, end_ts))
+                 for page_start in range(start_ts, end_ts + 1, page_ms)]
+
+        if len(pages) == 1:
+            results = [self._client.get_historical_candles(contract, timeframe, pages[0][0], pages[0][1],
+                                                           self._page_size)]
+        else:
+            logger.info("Requesting %s pages of %s %s candles", len(pages), contract.symbol, timeframe)
+
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                results = list(executor.map(
+                    lambda page: self._client.get_historical_candles(contract, timeframe, page[0], page[1],
+                                                                     self._page_size), pages))
+
+        rows = [(contract.symbol, timeframe, c.timestamp, c.open, c.high, c.low, c.close, c.volume)
+                for candles in results for c in candles]
+
+        if len(rows) == 0:
+            return
+
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
@@ -1,39 +1,134 @@
+import logging
 import sqlite3
+import threading
 import typing
 
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+logger = logging.getLogger()
+
+
+# Columns of each table, in the order of the tuples passed to WorkspaceData.save()
+# The key columns identify a row from one save to the next
+TABLES = {
+    "watchlist": {"columns": ["symbol", "exchange"], "key": ["symbol", "exchange"]},
+    "strategies": {"columns": ["row_key", "strategy_type", "contract", "timeframe", "balance_pct", "take_profit",
+                               "stop_loss", "extra_params"], "key": ["row_key"]},
+}
+
 
 class WorkspaceData:
-    def __init__(self):
-        self.conn = sqlite3.connect("database.db")
+    def __init__(self, path: str = "database.db"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)  # Also used by the writer thread
         self.conn.row_factory = sqlite3.Row  # Makes the data retrieved from the database accessible by their column name
         self.cursor = self.conn.cursor()
 
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1)  # Saves never block the Tkinter thread
+
+        # WAL lets the other connections to the database read while a save is being written
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+
         self.cursor.execute("CREATE TABLE IF NOT EXISTS watchlist (symbol TEXT, exchange TEXT)")
         self.cursor.execute("CREATE TABLE IF NOT EXISTS strategies (strategy_type TEXT, contract TEXT,"
                             "timeframe TEXT, balance_pct REAL, take_profit REAL, stop_loss REAL, extra_params TEXT)")
 
+        self._migrate()
+
         self.conn.commit()  # Saves the changes
 
-    def save(self, table: str, data: typing.List[typing.Tuple]):
+        # The statements are built once, sqlite3 then reuses the compiled statements from its cache
+
+        self._upsert_sql = dict()
+        self._delete_sql = dict()
+
+        for table, info in TABLES.items():
+            columns = info['columns']
+            updated = [c for c in columns if c not in info['key']]
+
+            self._upsert_sql[table] = f"INSERT INTO {table} ({', '.join(columns)}) " \
+                                      f"VALUES ({', '.join(['?'] * len(columns))}) " \
+                                      f"ON CONFLICT ({', '.join(info['key'])}) " + \
+                                      (f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updated)}"
+                                       if len(updated) > 0 else "DO NOTHING")
+            self._delete_sql[table] = f"DELETE FROM {table} WHERE {' AND '.join(f'{c} = ?' for c in info['key'])}"
+
+        # Last saved content of each table, rows by key, to only write the rows that changed
+
+        self._saved: typing.Dict[str, typing.Dict[typing.Tuple, typing.Tuple]] = dict()
+
+        for table in TABLES:
+            self._saved[table] = {self._key(table, row): row for row in
+                                  (tuple(row[c] for c in TABLES[table]['columns']) for row in self.get(table))}
+
+    def _migrate(self):
 
         """
-        Erase the previous table content and record new data to it.
-        :param table: The table name
-        :param data: A list of tuples, the tuples elements must be ordered like the table columns
+        Add the stable row keys to databases created by previous versions.
         :return:
         """
 
-        self.cursor.execute(f"DELETE FROM {table}")
+        strategies_columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(strategies)")]
+
+        if "row_key" not in strategies_columns:
+            self.cursor.execute("ALTER TABLE strategies ADD COLUMN row_key TEXT")
+            self.cursor.execute("UPDATE strategies SET row_key = lower(hex(randomblob(8))) WHERE row_key IS NULL")
+
+        # Symbols could be saved twice before the watchlist rows had a key
+        self.cursor.execute("DELETE FROM watchlist WHERE rowid NOT IN "
+                            "(SELECT MIN(rowid) FROM watchlist GROUP BY symbol, exchange)")
+
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS watchlist_key ON watchlist (symbol, exchange)")
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS strategies_key ON strategies (row_key)")
+
+    @staticmethod
+    def _key(table: str, row: typing.Tuple) -> typing.Tuple:
+        columns = TABLES[table]['columns']
+        return tuple(row[columns.index(c)] for c in TABLES[table]['key'])
+
+    def save(self, table: str, data: typing.List[typing.Tuple]) -> Future:
+
+        """
+        Record the new content of a table. Only the rows that changed since the last save are written (upserted or
+        deleted), in a background thread.
+        :param table: The table name
+        :param data: A list of tuples, the tuples elements must be ordered like TABLES[table]['columns']
+        :return: A Future completed when the changes are committed
+        """
+
+        new_rows = {self._key(table, row): tuple(row) for row in data}
+        saved_rows = self._saved[table]
+
+        upserts = [row for key, row in new_rows.items() if saved_rows.get(key) != row]
+        deletes = [key for key in saved_rows if key not in new_rows]
+
+        # The saved content only changes once the write succeeded, a failed save is retried by the next one
+
+        future = self._writer.submit(self._write, table, upserts, deletes)
+        future.add_done_callback(lambda f: self._on_written(table, new_rows, f))
+
+        return future
+
+    def _on_written(self, table: str, rows: typing.Dict[typing.Tuple, typing.Tuple], future: Future):
+        error = future.exception()
+
+        if error is not None:
+            logger.error("Error while saving the %s table: %s", table, error)
+            return
 
-        table_data = self.cursor.execute(f"SELECT * FROM {table}")
+        self._saved[table] = rows
 
-        columns = [description[0] for description in table_data.description]  # Lists the columns of the table
+    def _write(self, table: str, upserts: typing.List[typing.Tuple], deletes: typing.List[typing.Tuple]):
 
-        # Creates the SQL insert statement dynamically
-        sql_statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        if len(upserts) == 0 and len(deletes) == 0:
+            return
 
-        self.cursor.executemany(sql_statement, data)
-        self.conn.commit()
+        with self._lock:
+            with self.conn:  # One transaction, committed at the end of the block
+                self.conn.executemany(self._delete_sql[table], deletes)
+                self.conn.executemany(self._upsert_sql[table], upserts)
 
     def get(self, table: str) -> typing.List[sqlite3.Row]:
 
@@ -43,7 +138,8 @@ class WorkspaceData:
         :return: A list of sqlite3.Rows accessible like Python dictionaries.
         """
 
-        self.cursor.execute(f"SELECT * FROM {table}")
-        data = self.cursor.fetchall()
+        with self._lock:
+            self.cursor.execute(f"SELECT * FROM {table}")
+            data = self.cursor.fetchall()
 
         return data
@@ -0,0 +1,258 @@
+import json
+import logging
+import signal
+import threading
+import typing
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from CryptoCom import CryptoComClient
+from database import WorkspaceData
+from log_config import suppressed_logs
+from retention import memory_report
+
+
+logger = logging.getLogger()
+
+
+class HeadlessBot:
+    def __init__(self, client: CryptoComClient, host: str = "127.0.0.1", port: int = 8765):
+
+        """
+        Runs the strategies saved in the workspace without the Tkinter interface.
+        The bot is controlled through a small JSON API over HTTP, listening on localhost only by default:
+        GET  /status                       Connection state, strategies, queues, suppressed log messages
+        GET  /strategies                   Strategies of the workspace and whether they are running
+        GET  /trades?status=open           Trades of the running strategies
+        GET  /logs?limit=50                Last log messages of the connector and its strategies
+        GET  /performance                  PnL summary per strategy and instrument
+        GET  /memory                       Resident memory and memory used by each component
+        POST /strategies/<row_key>/start   Start a strategy saved in the workspace
+        POST /strategies/<row_key>/stop
+        POST /profile?seconds=10           Sample the threads and write a flame graph file, returns its path
+        POST /shutdown
+        :param client:
+        :param host:
+        :param port:
+        """
+
+        self.client = client
+        self.db = WorkspaceData()
+
+        self._server = ThreadingHTTPServer((host, port), _ControlHandler)
+        self._server.bot = self
+
+        self._stopped = threading.Event()
+
+    def run(self):
+
+        """
+        Start the saved strategies and serve the control API until shutdown() is called or the process is
+        interrupted (Ctrl+C or SIGTERM).
+        :return:
+        """
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: self._stopped.set())
+
+        for row in self.db.get("strategies"):
+            error = self.start_strategy(row['row_key'])
+            if error is not None:
+                logger.warning("%s", error)
+
+        server_thread = threading.Thread(target=self._server.serve_forever, name="control_api", daemon=True)
+        server_thread.start()
+
+        logger.info("Headless mode, control API listening on http://%s:%s", *self._server.server_address[:2])
+
+        self._stopped.wait()
+
+        self._server.shutdown()
+        self._server.server_close()
+
+        self.client.reconnect = False  # Avoids the infinite reconnect loop in _start_ws()
+        self.client.ws.close()
+        self.client.scheduler.stop()
+
+        if self.client.workers is not None:
+            self.client.workers.stop()
+
+        self.client.journal.stop()  # Writes the trades and orders still waiting in the queue
+
+        logger.info("Headless mode stopped")
+
+    def shutdown(self):
+        self._stopped.set()
+
+    def start_strategy(self, row_key: str) -> typing.Optional[str]:
+
+        """
+        Start a strategy with the parameters saved in the workspace.
+        :param row_key:
+        :return: None if the strategy was started, the reason otherwise
+        """
+
+        rows = [row for row in self.db.get("strategies") if row['row_key'] == row_key]
+        if len(rows) == 0:
+            return f"Unknown strategy {row_key}"
+
+        row = rows[0]
+
+        if row_key in self.client.strategies:
+            return f"Strategy {row_key} is already running"
+
+        symbol = row['contract'].rsplit("_", 1)[0]  # Saved as SYMBOL_Exchange
+        if symbol not in self.client.contracts:
+            return f"Unknown contract {row['contract']}"
+
+        try:
+            balance_pct = float(row['balance_pct'])
+            take_profit = float(row['take_profit'])
+            stop_loss = float(row['stop_loss'])
+        except (TypeError, ValueError):
+            return f"Missing balance_pct, take_profit or stop_loss parameter for strategy {row_key}"
+
+        extra_params = json.loads(row['extra_params'])
+
+        for param, value in extra_params.items():
+            if value is None:
+                return f"Missing {param} parameter for strategy {row_key}"
+
+        strategy = self.client.start_strategy(row_key, row['strategy_type'], self.client.contracts[symbol],
+                                              row['timeframe'], balance_pct, take_profit, stop_loss, extra_params)
+
+        if strategy is None:
+            return f"Strategy {row_key} could not be started, see the logs"
+
+        logger.info("%s strategy on %s / %s started", row['strategy_type'], symbol, row['timeframe'])
+
+        return None
+
+    def stop_strategy(self, row_key: str) -> typing.Optional[str]:
+        if row_key not in self.client.strategies:
+            return f"Strategy {row_key} is not running"
+
+        self.client.stop_strategy(row_key)
+
+        logger.info("Strategy %s stopped", row_key)
+
+        return None
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        return {"ws_connected": self.client.ws_connected,
+                "strategies_running": len(self.client.strategies),
+                "scheduler": self.client.scheduler.metrics(),
+                "journal_pending": self.client.journal.pending,
+                "log_queue": len(self.client.log_queue),
+                "exposure": self.client.risk.exposure(),
+                "risk_rejections": self.client.risk.rejections,
+                "suppressed_logs": suppressed_logs()}
+
+    def strategies(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        return [{"row_key": row['row_key'], "strategy_type": row['strategy_type'], "contract": row['contract'],
+                 "timeframe": row['timeframe'], "running": row['row_key'] in self.client.strategies}
+                for row in self.db.get("strategies")]
+
+    def trades(self, status: typing.Optional[str] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+        trades = []
+
+        for key, strat in list(self.client.strategies.items()):
+            for trade in strat.trades:
+                if status is not None and trade.status != status:
+                    continue
+
+                trades.append({"id": trade.id, "time": trade.time, "symbol": trade.contract.symbol,
+                               "strategy": trade.strategy, "side": trade.side, "quantity": trade.quantity,
+                               "entry_price": trade.entry_price, "exit_price": trade.exit_price,
+                               "status": trade.status, "pnl": trade.pnl})
+
+        return trades
+
+    def logs(self, limit: int) -> typing.List[typing.Dict[str, str]]:
+        logs = list(self.client.logs)
+        for strat in list(self.client.strategies.values()):
+            logs.extend(strat.logs)
+
+        return logs[-limit:] if limit > 0 else []
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    server: ThreadingHTTPServer
+
+    def do_GET(self):
+        bot: HeadlessBot = self.server.bot
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/status":
+            self._reply(200, bot.status())
+        elif url.path == "/strategies":
+            self._reply(200, bot.strategies())
+        elif url.path == "/trades":
+            self._reply(200, bot.trades(query.get("status", [None])[0]))
+        elif url.path == "/logs":
+            try:
+                limit = int(query.get("limit", ["50"])[0])
+            except ValueError:
+                self._reply(400, {"error": "limit must be an integer"})
+                return
+
+            self._reply(200, bot.logs(limit))
+        elif url.path == "/performance":
+            self._reply(200, bot.client.analytics.summary())
+        elif url.path == "/memory":
+            self._reply(200, memory_report(bot.client))
+        else:
+            self._reply(404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        bot: HeadlessBot = self.server.bot
+
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+
+        if parts == ["shutdown"]:
+            self._reply(200, {"result": "stopping"})
+            bot.shutdown()
+        elif len(parts) == 3 and parts[0] == "strategies" and parts[2] in ("start", "stop"):
+            if parts[2] == "start":
+                error = bot.start_strategy(parts[1])
+            else:
+                error = bot.stop_strategy(parts[1])
+
+            if error is None:
+                self._reply(200, {"result": "ok"})
+            else:
+                self._reply(400, {"error": error})
+        elif parts == ["profile"]:
+            try:
+                seconds = float(parse_qs(url.query).get("seconds", ["10"])[0])
+            except ValueError:
+                seconds = None
+
+            if seconds is None or not 0 < seconds < float("inf"):
+                self._reply(400, {"error": "seconds must be a positive number"})
+                return
+
+            path = bot.client.profiler.start(seconds)
+
+            if path is None:
+                self._reply(409, {"error": "A profile is already running"})
+            else:
+                self._reply(200, {"result": "profiling", "seconds": seconds, "path": path})
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def _reply(self, code: int, data):
+        body = json.dumps(data, default=str).encode()
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        logger.debug("Control API: " + format, *args)
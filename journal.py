@@ -0,0 +1,233 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import typing
+
+from models import *
+
+
+logger = logging.getLogger()
+
+
+TRADE_COLUMNS = ["trade_id", "strategy", "instrument", "side", "status", "entry_id", "entry_price", "exit_price",
+                 "quantity", "pnl", "open_time", "close_time", "strategy_id"]
+ORDER_COLUMNS = ["order_id", "instrument", "side", "order_type", "status", "quantity", "avg_price", "time"]
+
+
+class TradeJournal:
+    def __init__(self, path: str = "database.db", flush_interval: float = 1.0, batch_size: int = 500):
+
+        """
+        Trades and orders history saved to SQLite.
+        The record methods only put a snapshot in a queue: a background thread writes the queued snapshots in one
+        transaction every flush_interval seconds, so that the websocket and strategy threads never wait on disk.
+        :param path: SQLite database file
+        :param flush_interval: Maximum delay in seconds before a snapshot is written
+        :param batch_size: Maximum number of snapshots per transaction
+        """
+
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+
+        self._lock = threading.Lock()  # The writer thread and the readers share the connection
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        self.conn.execute("CREATE TABLE IF NOT EXISTS trades (trade_id TEXT PRIMARY KEY, strategy TEXT, "
+                          "instrument TEXT, side TEXT, status TEXT, entry_id TEXT, entry_price REAL, exit_price REAL, "
+                          "quantity REAL, pnl REAL, open_time INTEGER, close_time INTEGER, strategy_id TEXT)")
+
+        self.conn.execute("CREATE INDEX IF NOT EXISTS trades_strategy_id ON trades (strategy_id, status)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS trades_strategy ON trades (strategy, open_time)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS trades_instrument ON trades (instrument, open_time)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS trades_status ON trades (status)")
+
+        self.conn.execute("CREATE TABLE IF NOT EXISTS orders (order_id TEXT PRIMARY KEY, instrument TEXT, side TEXT, "
+                          "order_type TEXT, status TEXT, quantity REAL, avg_price REAL, time INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS orders_instrument ON orders (instrument, time)")
+
+        self.conn.commit()
+
+        self._trade_sql = f"INSERT OR REPLACE INTO trades ({', '.join(TRADE_COLUMNS)}) " \
+                          f"VALUES ({', '.join(['?'] * len(TRADE_COLUMNS))})"
+        self._order_sql = f"INSERT OR REPLACE INTO orders ({', '.join(ORDER_COLUMNS)}) " \
+                          f"VALUES ({', '.join(['?'] * len(ORDER_COLUMNS))})"
+
+        self._queue: "queue.Queue[typing.Tuple[str, typing.Tuple]]" = queue.Queue()
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def record_trade(self, trade: Trade):
+
+        """
+        Queue the current state of a trade, called when it is opened, filled and closed.
+        :param trade:
+        :return:
+        """
+
+        self._queue.put(("trade", (trade.id, trade.strategy, trade.contract.symbol, trade.side, trade.status,
+                                   str(trade.entry_id), trade.entry_price, trade.exit_price, trade.quantity, trade.pnl,
+                                   trade.time, trade.close_time, trade.strategy_id)))
+
+    def record_order(self, contract: Contract, order_type: str, side: str, order_status: OrderStatus):
+
+        """
+        Queue the current state of an order.
+        :param contract:
+        :param order_type:
+        :param side:
+        :param order_status:
+        :return:
+        """
+
+        self._queue.put(("order", (str(order_status.order_id), contract.symbol, side.lower(), order_type.upper(),
+                                   order_status.status, order_status.executed_qty, order_status.avg_price,
+                                   int(time.time() * 1000))))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+
+        """
+        Block until all the queued snapshots are written. Meant for shutdown and scripts, not for the hot path.
+        :return:
+        """
+
+        self._queue.join()
+
+    def stop(self):
+        self.flush()
+        self._running = False
+
+    def _run(self):
+
+        """
+        Writer thread: wait for a first snapshot, collect the others queued until the flush interval elapsed,
+        then write them all in one transaction.
+        :return:
+        """
+
+        while self._running:
+            try:
+                batch = [self._queue.get(timeout=self._flush_interval)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self._flush_interval
+
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+            except sqlite3.Error as e:
+                logger.error("Error while writing %s records to the trade journal: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: typing.List[typing.Tuple[str, typing.Tuple]]):
+        trades = [row for kind, row in batch if kind == "trade"]
+        orders = [row for kind, row in batch if kind == "order"]
+
+        with self._lock:
+            with self.conn:  # One transaction, committed at the end of the block
+                if len(trades) > 0:
+                    self.conn.executemany(self._trade_sql, trades)
+                if len(orders) > 0:
+                    self.conn.executemany(self._order_sql, orders)
+
+    def get_trades(self, strategy: typing.Optional[str] = None, instrument: typing.Optional[str] = None,
+                   start: typing.Optional[int] = None, end: typing.Optional[int] = None,
+                   status: typing.Optional[str] = None, order_by: str = "open_time") -> typing.List[sqlite3.Row]:
+
+        """
+        Get the journaled trades, filtered on the indexed columns. Snapshots still in the queue are not included.
+        :param strategy: Strategy name, e.g: Technical, Breakout
+        :param instrument:
+        :param start: Unix timestamp in milliseconds, minimum open time
+        :param end: Unix timestamp in milliseconds, maximum open time
+        :param status: open or closed
+        :param order_by: open_time or close_time
+        :return: A list of sqlite3.Rows ordered by order_by
+        """
+
+        if order_by not in ("open_time", "close_time"):
+            raise ValueError(f"Trades can't be ordered by {order_by}")
+
+        conditions, params = self._conditions([("strategy = ?", strategy), ("instrument = ?", instrument),
+                                               ("open_time >= ?", start), ("open_time <= ?", end),
+                                               ("status = ?", status)])
+
+        with self._lock:
+            return self.conn.execute(f"SELECT * FROM trades{conditions} ORDER BY {order_by}", params).fetchall()
+
+    def get_orders(self, instrument: typing.Optional[str] = None, start: typing.Optional[int] = None,
+                   end: typing.Optional[int] = None) -> typing.List[sqlite3.Row]:
+
+        """
+        Get the journaled orders, filtered on the indexed columns.
+        :param instrument:
+        :param start: Unix timestamp in milliseconds
+        :param end: Unix timestamp in milliseconds
+        :return: A list of sqlite3.Rows ordered by time
+        """
+
+        conditions, params = self._conditions([("instrument = ?", instrument), ("time >= ?", start),
+                                               ("time <= ?", end)])
+
+        with self._lock:
+            return self.conn.execute(f"SELECT * FROM orders{conditions} ORDER BY time", params).fetchall()
+
+    @staticmethod
+    def _conditions(filters: typing.List[typing.Tuple[str, typing.Any]]) -> typing.Tuple[str, typing.List]:
+        used = [(condition, value) for condition, value in filters if value is not None]
+
+        if len(used) == 0:
+            return "", []
+
+        return " WHERE " + " AND ".join(c for c, v in used), [v for c, v in used]
+
+    def load_open_trades(self, contracts: typing.Dict[str, Contract], strategy_id: str) -> typing.List[Trade]:
+
+        """
+        Rebuild the trades still open at the end of the previous session, to resume their take profit / stop loss.
+        Only the trades of this strategy instance are returned, so that two strategies of the same type on the same
+        instrument never manage the same position.
+        :param contracts: Contracts of the connector, by instrument name
+        :param strategy_id: Persistent id of the strategy instance
+        :return:
+        """
+
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM trades WHERE strategy_id = ? AND status = 'open' "
+                                     "ORDER BY open_time", (strategy_id,)).fetchall()
+
+        trades = []
+
+        for row in rows:
+            if row['instrument'] not in contracts:
+                continue
+
+            trades.append(Trade({"id": row['trade_id'], "time": row['open_time'], "entry_price": row['entry_price'],
+                                 "contract": contracts[row['instrument']], "strategy": row['strategy'],
+                                 "side": row['side'], "status": row['status'], "pnl": row['pnl'],
+                                 "quantity": row['quantity'], "entry_id": row['entry_id'],
+                                 "exit_price": row['exit_price'], "close_time": row['close_time'],
+                                 "strategy_id": row['strategy_id']}))
+
+        return trades
@@ -0,0 +1,206 @@
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import typing
+
+
+class JsonLinesFormatter(logging.Formatter):
+
+    """
+    One compact JSON object per line, easier to parse than the text format: time (epoch seconds), level, thread,
+    logger name, call site and message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": round(record.created, 3), "level": record.levelname, "thread": record.threadName,
+                 "logger": record.name, "site": f"{record.module}:{record.lineno}", "message": record.getMessage()}
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+
+        return json.dumps(entry, separators=(",", ":"))
+
+
+class DedupFilter(logging.Filter):
+    def __init__(self, window: float = 60.0, max_per_site: int = 50, max_messages: int = 10_000):
+
+        """
+        Keeps the log volume bounded when the same errors repeat, e.g. at every reconnection attempt:
+        - A message identical to one logged less than window seconds ago (same level, call site and text) is dropped,
+        the next one let through after the window says how many were dropped
+        - A call site (file and line) logs at most max_per_site messages per window, even if they all differ
+        Warnings, errors and the records logged with extra={"dedup": False} (the order and trade events of the
+        _add_log() methods) are never dropped.
+        :param window: In seconds
+        :param max_per_site:
+        :param max_messages: Number of distinct recent messages remembered, the oldest are forgotten beyond that
+        """
+
+        super().__init__()
+
+        self._window = window
+        self._max_per_site = max_per_site
+        self._max_messages = max_messages
+
+        self._lock = threading.Lock()  # Records come from the websocket, scheduler and interface threads
+
+        self._messages: typing.Dict[typing.Tuple, typing.List] = dict()  # Message -> [first time, suppressed]
+        self._sites: typing.Dict[typing.Tuple[str, int], typing.List] = dict()  # Site -> [start, logged, suppressed]
+
+        # Counters
+
+        self.suppressed_total = 0
+        self.suppressed: typing.Dict[str, int] = dict()  # "module:line" -> number of messages dropped
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "dedup", True):
+            return True
+
+        now = record.created
+        message = record.getMessage()
+
+        site = (record.pathname, record.lineno)
+        key = (record.levelno, site, message)
+
+        with self._lock:
+            previous = self._messages.get(key)
+
+            if previous is not None and now - previous[0] < self._window:
+                previous[1] += 1
+                self._count_suppressed(record)
+                return False
+
+            site_window = self._sites.get(site)
+
+            if site_window is None or now - site_window[0] >= self._window:
+                site_suppressed = site_window[2] if site_window is not None else 0
+                site_window = [now, 0, 0]
+                self._sites[site] = site_window
+            else:
+                site_suppressed = 0
+
+            if site_window[1] >= self._max_per_site:
+                site_window[2] += 1
+                self._count_suppressed(record)
+                return False
+
+            site_window[1] += 1
+
+            if len(self._messages) >= self._max_messages:
+                self._forget_expired(now)
+
+            self._messages[key] = [now, 0]
+
+        notes = []
+        if previous is not None and previous[1] > 0:
+            notes.append(f"repeated {previous[1]} times in {now - previous[0]:.0f} s")
+        if site_suppressed > 0:
+            notes.append(f"{site_suppressed} messages from this line suppressed")
+
+        if len(notes) > 0:
+            record.msg = f"{message} ({', '.join(notes)})"
+            record.args = None
+
+        return True
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {"suppressed_total": self.suppressed_total, "suppressed": dict(self.suppressed)}
+
+    def _count_suppressed(self, record: logging.LogRecord):
+        site = f"{record.module}:{record.lineno}"
+
+        self.suppressed_total += 1
+        self.suppressed[site] = self.suppressed.get(site, 0) + 1
+
+    def _forget_expired(self, now: float):
+        self._messages = {key: value for key, value in self._messages.items() if now - value[0] < self._window}
+        self._sites = {site: value for site, value in self._sites.items() if now - value[0] < self._window}
+
+        if len(self._messages) >= self._max_messages:  # Still full, all the messages are recent
+            self._messages.clear()
+
+
+def suppressed_logs() -> typing.Dict[str, typing.Any]:
+
+    """
+    Counters of the DedupFilter installed by setup_logging(), empty if there is none.
+    :return:
+    """
+
+    for handler in logging.getLogger().handlers:
+        for log_filter in handler.filters:
+            if isinstance(log_filter, DedupFilter):
+                return log_filter.stats()
+
+    return dict()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+
+    """
+    The records stay in the process, so unlike the default QueueHandler they are neither copied nor formatted here:
+    only the message is merged with its arguments, which could change before the listener formats the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+
+def setup_logging(path: str = "info.log", json_lines: bool = False, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, rotate_when: typing.Optional[str] = None,
+                  stream: typing.Optional[typing.TextIO] = None,
+                  dedup_window: typing.Optional[float] = 60.0) -> logging.handlers.QueueListener:
+
+    """
+    Configure the root logger so that logging calls only put the record in a queue: the terminal and file handlers run
+    in a background thread (QueueListener), and the websocket thread never waits for the disk.
+    :param path: Log file
+    :param json_lines: Write the log file as JSON lines instead of text
+    :param max_bytes: Size at which the log file is rotated, when rotate_when is None
+    :param backup_count: Number of rotated files kept
+    :param rotate_when: Rotate on time instead of size: "midnight", "H" (hourly)... see TimedRotatingFileHandler
+    :param stream: Terminal output, sys.stderr if None
+    :param dedup_window: Window of the DedupFilter applied to all the records in seconds, None to keep every record
+    :return: The started listener, stop() it before exiting to write the remaining records
+    """
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)  # Overall minimum logging level
+
+    formatter = logging.Formatter('%(asctime)s %(levelname)s :: %(message)s')
+
+    stream_handler = logging.StreamHandler(stream)  # Configure the logging messages displayed in the Terminal
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(logging.INFO)  # Minimum logging level for the StreamHandler
+
+    # Configure the logging messages written to a file
+
+    if rotate_when is not None:
+        file_handler = logging.handlers.TimedRotatingFileHandler(path, when=rotate_when, backupCount=backup_count)
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+
+    file_handler.setFormatter(JsonLinesFormatter() if json_lines else formatter)
+    file_handler.setLevel(logging.DEBUG)  # Minimum logging level for the FileHandler
+
+    log_queue = queue.SimpleQueue()
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler, respect_handler_level=True)
+    listener.start()
+
+    queue_handler = _QueueHandler(log_queue)
+
+    if dedup_window is not None:
+        queue_handler.addFilter(DedupFilter(dedup_window))  # Dropped records don't even reach the queue
+
+    logger.addHandler(queue_handler)
+
+    return listener
@@ -1,25 +1,120 @@
 import tkinter as tk
+import collections
+import logging
+import typing
 from datetime import datetime
 
 from styling import *
 
 
+LEVELS = ["ALL", "INFO", "WARNING", "ERROR"]  # Minimum level displayed
+
+
 class Logging(tk.Frame):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_lines: int = 500, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self._max_lines = max_lines
+
+        # Last max_lines messages, kept to redraw the text when a filter changes: (line, level, source)
+        self._history: typing.Deque[typing.Tuple[str, str, str]] = collections.deque(maxlen=max_lines)
+        self._sources = set()
+
+        self._filters_frame = tk.Frame(self, bg=BG_COLOR)
+        self._filters_frame.pack(side=tk.TOP, anchor="nw")
+
+        self._level_var = tk.StringVar(value="ALL")
+        self._level_menu = tk.OptionMenu(self._filters_frame, self._level_var, *LEVELS,
+                                         command=lambda value: self._redraw())
+        self._level_menu.config(width=10, bd=0, indicatoron=0, font=GLOBAL_FONT)
+        self._level_menu.pack(side=tk.LEFT)
+
+        self._source_var = tk.StringVar(value="All sources")
+        self._source_menu = tk.OptionMenu(self._filters_frame, self._source_var, "All sources",
+                                          command=lambda value: self._redraw())
+        self._source_menu.config(width=25, bd=0, indicatoron=0, font=GLOBAL_FONT)
+        self._source_menu.pack(side=tk.LEFT)
+
         self.logging_text = tk.Text(self, height=10, width=60, state=tk.DISABLED, bg=BG_COLOR, fg=FG_COLOR_2,
                                     font=GLOBAL_FONT, highlightthickness=False, bd=0)
         self.logging_text.pack(side=tk.TOP)
 
-    def add_log(self, message: str):
+    def add_log(self, message: str, level: str = "INFO", source: str = "Interface"):
 
         """
         Add a new log message to the tk.Text widget, placed at the top, with the current UTC time in front of it.
         :param message: The new log message.
+        :param level: INFO, WARNING or ERROR
+        :param source: Component that produced the message, used by the source filter
+        :return:
+        """
+
+        self.add_logs([{"log": message, "level": level, "source": source}])
+
+    def add_logs(self, logs: typing.List[typing.Dict[str, str]]):
+
+        """
+        Add all the messages received since the last interface update with a single insert, and trim the text to
+        max_lines lines.
+        :param logs: Dictionaries with the keys log, and optionally level and source. Oldest first.
         :return:
         """
 
+        if len(logs) == 0:
+            return
+
+        time_str = datetime.utcnow().strftime("%a %H:%M:%S :: ")
+
+        lines = []
+
+        for log in logs:
+            entry = (time_str + log['log'] + "\n", log.get("level", "INFO"), log.get("source", "Interface"))
+            self._history.append(entry)
+
+            if entry[2] not in self._sources:
+                self._add_source(entry[2])
+
+            if self._is_displayed(entry):
+                lines.append(entry[0])
+
+        if len(lines) > 0:
+            lines.reverse()  # The most recent message goes at the top
+            self._insert("".join(lines))
+
+    def _insert(self, text: str):
         self.logging_text.configure(state=tk.NORMAL)  # Unlocks the tk.Text widgets
-        self.logging_text.insert("1.0", datetime.utcnow().strftime("%a %H:%M:%S :: ") + message + "\n")
+        self.logging_text.insert("1.0", text)
+        self.logging_text.delete(f"{self._max_lines + 1}.0", tk.END)  # Drops the oldest lines at the bottom
         self.logging_text.configure(state=tk.DISABLED)  # Locks the tk.Text widget to avoid accidentally inserting in it
+
+    def _is_displayed(self, entry: typing.Tuple[str, str, str]) -> bool:
+        level = self._level_var.get()
+        source = self._source_var.get()
+
+        if level != "ALL" and logging.getLevelName(entry[1]) < logging.getLevelName(level):
+            return False
+
+        return source == "All sources" or entry[2] == source
+
+    def _add_source(self, source: str):
+        self._sources.add(source)
+        self._source_menu['menu'].add_command(label=source, command=lambda: self._select_source(source))
+
+    def _select_source(self, source: str):
+        self._source_var.set(source)
+        self._redraw()
+
+    def _redraw(self):
+
+        """
+        Rebuild the text from the history after a filter changed.
+        :return:
+        """
+
+        lines = [entry[0] for entry in self._history if self._is_displayed(entry)]
+        lines.reverse()
+
+        self.logging_text.configure(state=tk.NORMAL)
+        self.logging_text.delete("1.0", tk.END)
+        self.logging_text.insert("1.0", "".join(lines))
+        self.logging_text.configure(state=tk.DISABLED)
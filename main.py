@@ -1,36 +1,83 @@
 import logging
+import argparse
+import atexit
 
-from CryptoCom import CryptoComClient
+from startup_profiler import StartupProfiler
+
+profiler = StartupProfiler()  # Reports the startup time when the program is run with --profile-startup
 
-from root_component import Root
+from CryptoCom import CryptoComClient
 
 from models import Contract
+from log_config import setup_logging
+from metrics import start_http_server
 
+profiler.mark("imports: connector")
 
-# Create and configure the logger object
 
 logger = logging.getLogger()
 
-logger.setLevel(logging.DEBUG)  # Overall minimum logging level
 
-stream_handler = logging.StreamHandler()  # Configure the logging messages displayed in the Terminal
-formatter = logging.Formatter('%(asctime)s %(levelname)s :: %(message)s')
-stream_handler.setFormatter(formatter)
-stream_handler.setLevel(logging.INFO)  # Minimum logging level for the StreamHandler
+if __name__ == '__main__':  # Execute the following code only when executing main.py (not when importing it)
+
+    parser = argparse.ArgumentParser(description="Trading Bot")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run the strategies saved in the workspace without the interface")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the control API in headless mode")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Log the time spent in imports, bootstrap I/O and widgets construction")
+    parser.add_argument("--log-json", action="store_true", help="Write info.log as JSON lines")
+    parser.add_argument("--metrics-port", type=int, default=9108,
+                        help="Port of the Prometheus metrics endpoint on localhost, 0 to disable it")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Processes computing the Technical strategies signals, 0 to keep them in this process")
+    parser.add_argument("--paper", action="store_true",
+                        help="Simulate the orders against the live market data instead of sending them")
+    args = parser.parse_args()
 
-file_handler = logging.FileHandler('info.log')  # Configure the logging messages written to a file
-file_handler.setFormatter(formatter)
-file_handler.setLevel(logging.DEBUG)  # Minimum logging level for the FileHandler
+    # Create and configure the logger object, the handlers run in a background thread
 
-logger.addHandler(stream_handler)
-logger.addHandler(file_handler)
+    log_listener = setup_logging("info.log", json_lines=args.log_json)
+    atexit.register(log_listener.stop)  # Writes the records still in the queue before exiting
 
+    if args.metrics_port != 0:
+        try:
+            start_http_server(args.metrics_port)
+        except OSError as e:  # Port taken, e.g. by another instance of the bot: the metrics are optional
+            logger.warning("Metrics endpoint not started on port %s: %s", args.metrics_port, e)
 
-if __name__ == '__main__':  # Execute the following code only when executing main.py (not when importing it)
+    if args.paper:
+        from paper_trading import PaperTradingClient
+
+        CryptoCom = PaperTradingClient(strategy_processes=args.workers)
+    else:
+        CryptoCom = CryptoComClient(
+                                    testnet=False, cryptocom=True, strategy_processes=args.workers)
+
+    profiler.mark("bootstrap: REST and databases")
+
+    if args.headless:
+        from headless import HeadlessBot  # Doesn't import Tkinter
+
+        bot = HeadlessBot(CryptoCom, port=args.port)
+
+        profiler.mark("headless: control API")
+        if args.profile_startup:
+            profiler.report()
+
+        bot.run()
+
+    else:
+        from root_component import Root
+
+        profiler.mark("imports: interface")
+
+        root = Root(CryptoCom)
 
-    CryptoCom = CryptoComClient(
-                                testnet=False, cryptocom=True)
+        profiler.mark("interface: widgets")
 
-    root = Root(CryptoCom)
+        if args.profile_startup:
+            # Idle callbacks run in order, so this one runs once the widgets created above are drawn
+            root.after_idle(lambda: (profiler.mark("interface: first frame"), profiler.report()))
 
-    root.mainloop()
+        root.mainloop()
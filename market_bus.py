@@ -0,0 +1,124 @@
+import logging
+import struct
+import typing
+
+from multiprocessing import shared_memory
+
+
+logger = logging.getLogger()
+
+
+HEADER = struct.Struct("<QQQ")  # Write sequence, capacity, end of the records being written
+RECORD = struct.Struct("<qqdd")  # Instrument id, timestamp in milliseconds, price, size
+RECORDS_OFFSET = 64  # Records start on their own cache line, away from the sequence updated at every publish
+
+
+class MarketDataBus:
+    def __init__(self, capacity: int = 65536, name: typing.Optional[str] = None):
+
+        """
+        Ring buffer of public trades in shared memory, written by the connector process and read by the strategy
+        worker processes without any copy through a pipe or any lock.
+        There is a single writer: publish() writes the records and only then moves the write sequence forward, the
+        readers never see a record that isn't fully written. Writing a record overwrites the one published capacity
+        records before it, so publish() first announces how far it is about to write, and read() discards the records
+        that the writer may have been overwriting while they were copied. A reader more than capacity records behind
+        has lost the oldest ones, read() tells how many.
+        :param capacity: Number of records kept, the reader that falls further behind loses trades
+        :param name: Attach to the bus created by another process, create a new one if None
+        """
+
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=RECORDS_OFFSET + capacity * RECORD.size)
+            HEADER.pack_into(self._shm.buf, 0, 0, capacity, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self.name = self._shm.name
+        self.capacity = HEADER.unpack_from(self._shm.buf, 0)[1]
+
+        self._buf = self._shm.buf
+
+    @property
+    def sequence(self) -> int:
+
+        """
+        Number of records published since the bus was created, i.e. the sequence of the next record.
+        """
+
+        return HEADER.unpack_from(self._buf, 0)[0]
+
+    def publish(self, instrument_id: int, trades: typing.List[typing.Tuple[float, float, int]]):
+
+        """
+        Append trades to the ring, from the writer process only.
+        :param instrument_id: Id given to the instrument by the writer, the readers are told which symbol it is
+        :param trades: (price, size, timestamp) tuples
+        :return:
+        """
+
+        seq = self.sequence
+
+        struct.pack_into("<Q", self._buf, 16, seq + len(trades))  # The slots of these records are no longer readable
+
+        for price, size, timestamp in trades:
+            RECORD.pack_into(self._buf, RECORDS_OFFSET + (seq % self.capacity) * RECORD.size, instrument_id,
+                             timestamp, price, size)
+            seq += 1
+
+        struct.pack_into("<Q", self._buf, 0, seq)  # Publishes the records written above
+
+    def read(self, cursor: int,
+             max_records: int = 10000) -> typing.Tuple[typing.List[typing.Tuple[int, int, float, float]], int, int]:
+
+        """
+        Records published since cursor.
+        :param cursor: Sequence of the first record wanted, the new cursor returned by the previous call
+        :param max_records: Maximum number of records returned, the rest is read by the next call
+        :return: (instrument id, timestamp, price, size) records, the new cursor, the number of records lost because
+        the reader fell behind
+        """
+
+        end = self.sequence
+        lost = 0
+
+        if end - cursor > self.capacity:
+            lost = end - self.capacity - cursor
+            cursor = end - self.capacity
+
+        end = min(end, cursor + max_records)
+        records = []
+
+        # The range may wrap around the end of the buffer: read it in at most two contiguous slices
+
+        position = cursor
+        while position < end:
+            index = position % self.capacity
+            count = min(end - position, self.capacity - index)
+            start = RECORDS_OFFSET + index * RECORD.size
+
+            records.extend(RECORD.iter_unpack(self._buf[start:start + count * RECORD.size]))
+            position += count
+
+        # Records overwritten by the writer while they were being read are discarded and counted as lost. This
+        # includes the records of a publish() still in progress, whose end is announced before they are written
+
+        overwritten = struct.unpack_from("<Q", self._buf, 16)[0] - self.capacity - cursor
+        if overwritten > 0:
+            records = records[overwritten:]
+            lost += overwritten
+
+        return records, end, lost
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+
+        """
+        Free the shared memory, by the process that created the bus once the readers are stopped.
+        :return:
+        """
+
+        self._shm.unlink()
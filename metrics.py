@@ -0,0 +1,289 @@
+import bisect
+import logging
+import threading
+import typing
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()):
+
+        """
+        Base of the metrics: one value per combination of label values (a "child"), created on first use.
+        Updating a metric only changes numbers in memory, the text exposition is only built when the endpoint is
+        scraped.
+        :param name: Metric name, e.g. ws_messages_total
+        :param documentation: HELP text
+        :param labelnames: Names of the labels, the values are given to labels() in the same order
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._children: typing.Dict[typing.Tuple[str, ...], typing.Any] = dict()
+
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> typing.List[typing.Tuple[str, typing.Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def _label_dict(self, values: typing.Tuple[str, ...]) -> typing.Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        return [(self.name, self._label_dict(values), child.value) for values, child in list(self._children.items())]
+
+
+class _GaugeValue:
+    __slots__ = ("value", "function", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: typing.Optional[typing.Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: typing.Callable[[], float]):
+
+        """
+        Compute the value only when the endpoint is scraped, e.g. the size of a queue.
+        :param function:
+        :return:
+        """
+
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return float(self.function())
+        return self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: typing.Callable[[], float]):
+        self.labels().set_function(function)
+
+    def _samples(self):
+        samples = []
+
+        for values, child in list(self._children.items()):
+            try:
+                samples.append((self.name, self._label_dict(values), child.get()))
+            except Exception as e:  # The object measured by the function may be gone
+                logger.debug("Error while computing the gauge %s %s: %s", self.name, values, e)
+
+        return samples
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: typing.List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (),
+                 buckets: typing.Sequence[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)):
+        self._buckets = sorted(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self._buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        samples = []
+
+        for values, child in list(self._children.items()):
+            labels = self._label_dict(values)
+
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+
+            cumulative = 0
+            for bound, count in zip(self._buckets + [float("inf")], counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", dict(labels, le=_format_value(bound)), cumulative))
+
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, cumulative))
+
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: typing.Dict[str, _Metric] = dict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def exposition(self) -> str:
+
+        """
+        All the metrics in the Prometheus text format (version 0.0.4).
+        :return:
+        """
+
+        lines = []
+
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for name, labels, value in metric._samples():
+                if len(labels) > 0:
+                    label_str = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{label_str}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+
+# Metrics of the connector, its strategies and the interface
+
+WS_MESSAGES = Counter("ws_messages_total", "Websocket messages received", ["channel"])
+WS_RECONNECTS = Counter("ws_reconnects_total", "Websocket connections lost and reopened")
+REST_LATENCY = Histogram("rest_request_seconds", "REST request duration", ["method", "endpoint"])
+REST_ERRORS = Counter("rest_errors_total", "REST requests failed or answered with an error", ["method", "endpoint"])
+ORDERS = Counter("orders_total", "Orders by outcome: rejected by the risk checks, failed, or exchange status",
+                 ["outcome"])
+SIGNALS = Counter("strategy_signals_total", "Long and short signals of the strategies", ["strategy", "side"])
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting in the internal queues", ["queue"])
+RESIDENT_MEMORY = Gauge("process_resident_memory_bytes", "Resident memory of the process")
+UI_LOOP = Histogram("ui_loop_seconds", "Duration of one interface update", [],
+                    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+UI_LOG_INSERT = Histogram("ui_log_insert_seconds", "Time spent displaying the new log messages in one interface update",
+                          [], buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = REGISTRY.exposition().encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        pass  # One request per scrape interval, not worth a log line
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+
+    """
+    Serve the metrics on http://host:port/metrics from a background thread.
+    :param port:
+    :param host: Localhost only by default
+    :return: The server, shutdown() it to stop serving
+    """
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+
+    logger.info("Metrics served on http://%s:%s/metrics", host, port)
+
+    return server
@@ -1,9 +1,11 @@
-import dateutil.parser
 import datetime
+import typing
 
 
 
 class Balance:
+    __slots__ = ("initial_margin", "maintenance_margin", "margin_balance", "wallet_balance", "unrealized_pnl")
+
     def __init__(self, info, exchange):
         if exchange == "crypto_com":
             self.initial_margin = float(info['initialMargin'])
@@ -15,6 +17,8 @@ class Balance:
 
 
 class Candle:
+    __slots__ = ("timestamp", "open", "high", "low", "close", "volume")  # No per-instance __dict__
+
     def __init__(self, candle_info, timeframe, exchange):
         if exchange in ["crypto_com"]:
             self.timestamp = candle_info[0]
@@ -25,6 +29,8 @@ class Candle:
             self.volume = float(candle_info[5])
 
         elif exchange == "bitmex":
+            import dateutil.parser  # Only needed for Bitmex, imported on first use to keep the startup fast
+
             self.timestamp = dateutil.parser.isoparse(candle_info['timestamp'])
             self.timestamp = self.timestamp - datetime.timedelta(minutes=0[timeframe])
             self.timestamp = int(self.timestamp.timestamp() * 1000)
@@ -36,11 +42,57 @@ class Candle:
 
         elif exchange == "parse_trade":
             self.timestamp = candle_info['ts']
-            self.open = candle_info['o']
-            self.high = candle_info['h']
-            self.low = candle_info['l']
-            self.close = candle_info['c']
-            self.volume = candle_info['v']
+            self.open = candle_info['open']
+            self.high = candle_info['high']
+            self.low = candle_info['low']
+            self.close = candle_info['close']
+            self.volume = candle_info['volume']
+
+    @classmethod
+    def from_values(cls, timestamp: int, open_price: float, high: float, low: float, close: float,
+                    volume: float) -> "Candle":
+
+        """
+        Build a Candle from already parsed values, without going through the exchange specific parsing.
+        :return:
+        """
+
+        candle = cls.__new__(cls)
+        candle.timestamp = timestamp
+        candle.open = open_price
+        candle.high = high
+        candle.low = low
+        candle.close = close
+        candle.volume = volume
+
+        return candle
+
+    @classmethod
+    def bulk(cls, raw_candles: typing.Iterable, timeframe: str, exchange: str) -> typing.List["Candle"]:
+
+        """
+        Parse a whole REST payload in one pass, the exchange format being resolved once instead of for every candle.
+        :param raw_candles: List of [timestamp, open, high, low, close, volume] (crypto_com) or dictionaries
+        :param timeframe:
+        :param exchange:
+        :return:
+        """
+
+        if exchange == "crypto_com":
+            new = cls.__new__
+            candles = []
+            for c in raw_candles:
+                candle = new(cls)
+                candle.timestamp = c[0]
+                candle.open = float(c[1])
+                candle.high = float(c[2])
+                candle.low = float(c[3])
+                candle.close = float(c[4])
+                candle.volume = float(c[5])
+                candles.append(candle)
+            return candles
+
+        return [cls(c, timeframe, exchange) for c in raw_candles]
 
 
 def tick_to_decimals(tick_size: float) -> int:
@@ -57,6 +109,9 @@ def tick_to_decimals(tick_size: float) -> int:
 
 
 class Contract:
+    __slots__ = ("symbol", "base_asset", "quote_asset", "price_decimals", "quantity_decimals", "tick_size",
+                 "lot_size", "quanto", "inverse", "multiplier", "exchange")
+
     def __init__(self, contract_info, exchange):
         if exchange == "crypto_com":
             self.symbol = contract_info['instrument_name']
@@ -99,8 +154,18 @@ class Contract:
 
         self.exchange = exchange
 
+    @property
+    def instrument_name(self) -> str:
+        return self.symbol  # Name used by the Crypto.com API and the connector
+
+
+# Order statuses after which the exchange won't fill anything more
+FINAL_ORDER_STATUSES = ("filled", "canceled", "rejected", "expired")
+
 
 class OrderStatus:
+    __slots__ = ("order_id", "status", "avg_price", "executed_qty")
+
     def __init__(self, order_info, exchange):
         if exchange == "crypto_com":
             self.order_id = order_info['order_id']
@@ -120,16 +185,24 @@ class OrderStatus:
 
 
 class Trade:
+    __slots__ = ("id", "time", "contract", "strategy", "side", "entry_price", "status", "pnl", "quantity", "entry_id",
+                 "exit_price", "close_time", "strategy_id", "version")
+
     def __init__(self, trade_info):
         self.time: int = trade_info['time']
         self.contract: Contract = trade_info['contract']
         self.strategy: str = trade_info['strategy']
         self.side: str = trade_info['side']
-        self.entry_price: float = trade_info['price']
+        self.entry_price: float = trade_info['entry_price']
         self.status: str = trade_info['status']
-        self.pnl: float = trade_info['realized_pnl']
+        self.pnl: float = trade_info['pnl']
         self.quantity = trade_info['quantity']
-        self.entry_id = trade_info['order_id']
+        self.entry_id = trade_info['entry_id']
+        self.id: str = trade_info.get('id', str(self.entry_id))  # Stable identifier, the entry order id is unique
+        self.exit_price: typing.Optional[float] = trade_info.get('exit_price')
+        self.close_time: typing.Optional[int] = trade_info.get('close_time')
+        self.strategy_id: typing.Optional[str] = trade_info.get('strategy_id')  # Strategy instance that owns the trade
+        self.version = 0  # Incremented on every change, see CryptoComClient.mark_trade_dirty()
 
 
 
@@ -0,0 +1,470 @@
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+import typing
+
+from models import *
+from CryptoCom import CryptoComClient
+
+
+logger = logging.getLogger()
+
+
+DEFAULT_PAPER_SETTINGS = {
+    "latency_ms": 50,  # Between place_order() and the order reaching the simulated book
+    "maker_fee_pct": 0.04,
+    "taker_fee_pct": 0.075,
+    "touch_size_quote": 5000.0,  # Quantity of each price level, in quote currency, when the feed doesn't give it
+    "impact_ticks": 5,  # Distance between two price levels beyond the best bid/ask, in ticks
+    "max_levels": 20,  # Price levels a market order can walk, the rest of the order is cancelled
+    "max_slippage_pct": 5.0,  # Maximum distance from the best bid/ask at which a market order is filled
+    "balances": {"USDT": 10000.0},  # Starting balances of the simulated account
+}
+
+# Private endpoints answered by the simulator, everything else (contracts, candles, bid/ask) goes to the exchange
+ORDER_ENDPOINTS = ("/order", "/cancel-order", "/get-orders", "/get-order", "/get-accounts")
+
+
+class SimOrder:
+    __slots__ = ("order_id", "contract", "side", "price", "quantity", "filled", "notional", "fees", "status",
+                 "arrival", "queue_ahead")
+
+    def __init__(self, order_id: int, contract: Contract, side: str, price: typing.Optional[float], quantity: float):
+        self.order_id = order_id
+        self.contract = contract
+        self.side = side  # buy or sell
+        self.price = price  # None for a market order
+        self.quantity = quantity
+        self.filled = 0.0
+        self.notional = 0.0  # Sum of the filled quantities times their price
+        self.fees = 0.0
+        self.status = "new"
+        self.arrival = 0  # Feed time in milliseconds when the order reaches the book
+        self.queue_ahead = 0.0  # Quantity resting at the same price before this order
+
+    @property
+    def remaining(self) -> float:
+        return self.quantity - self.filled
+
+    @property
+    def avg_price(self) -> float:
+        return self.notional / self.filled if self.filled > 0 else 0.0
+
+    def to_response(self) -> typing.Dict[str, typing.Any]:
+
+        """
+        The order as the exchange REST API returns it, parsed by OrderStatus like a real one.
+        """
+
+        return {"order_id": self.order_id, "status": self.status.upper(), "avg_price": self.avg_price,
+                "quantity": self.filled}
+
+
+class MatchingEngine:
+    def __init__(self, settings: typing.Dict[str, typing.Any],
+                 on_fill: typing.Callable[[SimOrder, float, float, float], None]):
+
+        """
+        Fills simulated orders against the public book and trade stream.
+        - Latency: an order only reaches the book latency_ms after it was placed, in feed time.
+        - Market orders and crossing limit orders take the liquidity of the best bid/ask, then walk levels of the
+        same size impact_ticks apart: large orders get partial fills at worse prices (market impact). The liquidity
+        taken stays consumed until the next book update, so simulated strategies compete for it.
+        - Resting limit orders join the queue behind the quantity displayed at their price. The public trades at
+        that price consume the queue first, the order is only filled by what trades beyond it. A trade through the
+        price, or the opposite side of the book crossing it, fills the order.
+        All the orders of all the instruments are kept sorted by price, so each market event only looks at the
+        orders it can fill: hundreds of strategies can share one feed.
+        :param settings: See DEFAULT_PAPER_SETTINGS
+        :param on_fill: Called with the order, the filled quantity, the price and the fee of every fill
+        """
+
+        self._settings = settings
+        self._on_fill = on_fill
+
+        self._lock = threading.RLock()  # Orders are placed from the websocket, scheduler and order gateway threads
+
+        # Symbol -> [bid, ask, bid size left, ask size left, bid level size, ask level size]
+        self._books: typing.Dict[str, typing.List[float]] = dict()
+
+        self._pending: typing.List[typing.Tuple[int, int, SimOrder]] = []  # Heap of the orders still in flight
+        self._bids: typing.Dict[str, typing.List[typing.Tuple[float, int, SimOrder]]] = dict()  # Best (highest) first
+        self._asks: typing.Dict[str, typing.List[typing.Tuple[float, int, SimOrder]]] = dict()  # Best (lowest) first
+
+        self.orders: typing.Dict[int, SimOrder] = dict()
+        self.now = 0  # Feed time of the last market event, in milliseconds
+
+    def submit(self, order: SimOrder):
+        with self._lock:
+            self.orders[order.order_id] = order
+            order.arrival = self.now + self._settings['latency_ms']
+
+            if self._settings['latency_ms'] <= 0:
+                self._arrive(order)
+            else:
+                heapq.heappush(self._pending, (order.arrival, order.order_id, order))
+
+    def cancel(self, order_id: int) -> typing.Optional[SimOrder]:
+        with self._lock:
+            order = self.orders.get(order_id)
+
+            if order is None or order.status in ("filled", "canceled", "rejected"):
+                return order
+
+            for resting in (self._bids, self._asks):
+                levels = resting.get(order.contract.symbol, [])
+                for i, entry in enumerate(levels):
+                    if entry[2] is order:
+                        del levels[i]
+                        break
+
+            # Still in flight: skipped when it arrives
+            order.status = "canceled"
+
+            return order
+
+    def on_book(self, symbol: str, bid: float, ask: float, bid_size: typing.Optional[float],
+                ask_size: typing.Optional[float], now: int):
+
+        """
+        Best bid/ask update. The sizes are None when the feed doesn't give them.
+        """
+
+        with self._lock:
+            self._advance(now)
+
+            mid = (bid + ask) / 2
+            default_size = self._settings['touch_size_quote'] / mid if mid > 0 else 0.0
+            bid_size = bid_size if bid_size is not None else default_size
+            ask_size = ask_size if ask_size is not None else default_size
+
+            self._books[symbol] = [bid, ask, bid_size, ask_size, bid_size, ask_size]
+
+            # Resting orders at the best price: the orders ahead of them may have been cancelled
+
+            for levels, price, size in ((self._bids.get(symbol), bid, bid_size), (self._asks.get(symbol), ask, ask_size)):
+                if levels:
+                    for key, order_id, order in levels:
+                        if order.price != price:
+                            break
+                        order.queue_ahead = min(order.queue_ahead, size)
+
+            # The opposite side moved through resting orders: they are filled by the incoming liquidity
+
+            self._match_resting(self._bids.get(symbol), lambda order: order.price >= ask, ask_size)
+            self._match_resting(self._asks.get(symbol), lambda order: order.price <= bid, bid_size)
+
+    def on_trade(self, symbol: str, price: float, size: float, taker_side: typing.Optional[str], now: int):
+
+        """
+        Public trade. taker_side is buy or sell, None if the feed doesn't tell: a sell taker hits the bids.
+        """
+
+        with self._lock:
+            self._advance(now)
+
+            if taker_side != "buy":
+                self._match_trade(self._bids.get(symbol), price, size, lambda order_price: order_price > price)
+            if taker_side != "sell":
+                self._match_trade(self._asks.get(symbol), price, size, lambda order_price: order_price < price)
+
+    def _advance(self, now: int):
+
+        """
+        Move the feed time forward and let the in-flight orders reach the book.
+        """
+
+        self.now = max(self.now, now)
+
+        while len(self._pending) > 0 and self._pending[0][0] <= self.now:
+            arrival, order_id, order = heapq.heappop(self._pending)
+
+            if order.status != "canceled":
+                self._arrive(order)
+
+    def _arrive(self, order: SimOrder):
+        book = self._books.get(order.contract.symbol)
+
+        if book is None:  # No price received yet for this instrument
+            order.status = "rejected" if order.filled == 0 else "canceled"
+            return
+
+        self._take(order, book)
+
+        if order.status == "filled":
+            return
+
+        if order.price is None:  # Not enough liquidity within the slippage limits: the rest is cancelled
+            order.status = "canceled"
+            return
+
+        # The rest of a limit order joins the book, behind the quantity displayed at its price
+
+        if order.side == "buy":
+            best, size = book[0], book[2]
+            order.queue_ahead = size if order.price == best else (0.0 if order.price > best else book[4])
+            bisect.insort(self._bids.setdefault(order.contract.symbol, []), (-order.price, order.order_id, order))
+        else:
+            best, size = book[1], book[3]
+            order.queue_ahead = size if order.price == best else (0.0 if order.price < best else book[5])
+            bisect.insort(self._asks.setdefault(order.contract.symbol, []), (order.price, order.order_id, order))
+
+    def _take(self, order: SimOrder, book: typing.List[float]):
+
+        """
+        Fill an incoming order against the best bid/ask, then against simulated levels beyond it, up to its limit
+        price. Market orders stop after max_levels levels or max_slippage_pct away from the best bid/ask.
+        """
+
+        buy = order.side == "buy"
+        touch = book[1] if buy else book[0]
+        step = order.contract.tick_size * self._settings['impact_ticks'] * (1 if buy else -1)
+        level_size = book[5] if buy else book[4]
+
+        if level_size <= 0 or touch <= 0:
+            return
+
+        limit = order.price
+        if limit is None:
+            slippage = touch * self._settings['max_slippage_pct'] / 100
+            limit = touch + slippage if buy else touch - slippage
+
+        level = 0
+
+        while order.status != "filled" and level < self._settings['max_levels']:
+            price = touch + level * step
+
+            if price <= 0 or (price > limit if buy else price < limit):
+                break
+
+            if level == 0:
+                available = book[3] if buy else book[2]
+            else:
+                available = level_size
+
+            quantity = min(order.remaining, available)
+
+            if quantity > 0:
+                self._fill(order, quantity, price, self._settings['taker_fee_pct'])
+
+                if level == 0:
+                    book[3 if buy else 2] -= quantity
+
+            level += 1
+
+    def _match_resting(self, levels: typing.Optional[typing.List], crossed: typing.Callable[[SimOrder], bool],
+                       available: float):
+        if not levels:
+            return
+
+        done = 0
+
+        for key, order_id, order in levels:
+            if available <= 0 or not crossed(order):
+                break
+
+            quantity = min(order.remaining, available)
+            self._fill(order, quantity, order.price, self._settings['maker_fee_pct'])
+            available -= quantity
+
+            if order.status == "filled":
+                done += 1
+
+        del levels[:done]
+
+    def _match_trade(self, levels: typing.Optional[typing.List], price: float, size: float,
+                     through: typing.Callable[[float], bool]):
+        if not levels:
+            return
+
+        done = 0
+
+        for key, order_id, order in levels:
+            if size <= 0:
+                break
+
+            if not through(order.price):
+                if order.price != price:
+                    break
+
+                # Trade at the order price: the orders ahead in the queue are filled first
+
+                consumed = min(order.queue_ahead, size)
+                order.queue_ahead -= consumed
+                size -= consumed
+
+                if size <= 0:
+                    break
+
+            quantity = min(order.remaining, size)
+            self._fill(order, quantity, order.price, self._settings['maker_fee_pct'])
+            size -= quantity
+
+            if order.status == "filled":
+                done += 1
+
+        del levels[:done]
+
+    def _fill(self, order: SimOrder, quantity: float, price: float, fee_pct: float):
+        fee = quantity * price * fee_pct / 100
+
+        order.filled += quantity
+        order.notional += quantity * price
+        order.fees += fee
+        order.status = "filled" if order.remaining <= 1e-12 else "partially_filled"
+
+        self._on_fill(order, quantity, price, fee)
+
+
+class PaperTradingClient(CryptoComClient):
+    JOURNAL_PATH = "paper.db"  # Simulated trades are kept apart from the real ones
+
+    def __init__(self, settings: typing.Optional[typing.Dict[str, typing.Any]] = None,
+                 contracts: typing.Optional[typing.Dict[str, Contract]] = None, live: bool = True,
+                 record_path: typing.Optional[str] = None, **kwargs):
+
+        """
+        Same interface as CryptoComClient, but the orders are filled by a MatchingEngine instead of the exchange,
+        against the live market data or a recording of it. No API key is needed and no private endpoint is called:
+        place_order(), cancel_order(), get_order_status() and get_balances() keep their risk checks, journal and
+        metrics, only the REST requests they make are answered by the simulator.
+        :param settings: Overrides of DEFAULT_PAPER_SETTINGS
+        :param contracts: Instruments to use instead of downloading them, e.g. to replay a recording offline
+        :param live: False to not connect the websocket, the market data then only comes from replay()
+        :param record_path: Append the websocket messages received to this file, to replay them later
+        :param kwargs: Other CryptoComClient arguments (risk_limits, retention, strategy_processes)
+        """
+
+        self.paper_settings = dict(DEFAULT_PAPER_SETTINGS)
+        if settings is not None:
+            self.paper_settings.update(settings)
+
+        self._paper_balances: typing.Dict[str, float] = dict(self.paper_settings['balances'])
+        self._paper_contracts = contracts
+        self._paper_ids = itertools.count(1)
+        self._live = live
+        self._replay_time: typing.Optional[int] = None
+
+        self.engine = MatchingEngine(self.paper_settings, self._on_paper_fill)
+
+        # Line buffered: every message is in the file as soon as it is received, even if the program is killed
+        self._record_file = open(record_path, "a", buffering=1) if record_path is not None else None
+
+        super().__init__("", "", testnet=False, cryptocom=True, **kwargs)
+
+        logger.info("Paper trading: orders are simulated, starting balances %s", self._paper_balances)
+
+    def replay(self, lines: typing.Iterable[str]):
+
+        """
+        Feed recorded websocket messages, as written with record_path, to the engine and the strategies.
+        The feed time is the time the messages were received, so the latency is simulated the same way as live.
+        :param lines: "time in milliseconds<TAB>message" lines
+        :return:
+        """
+
+        for line in lines:
+            timestamp, msg = line.rstrip("\n").split("\t", 1)
+            self._replay_time = int(timestamp)
+            self._on_message(None, msg)
+
+        self._replay_time = None
+
+    def get_contracts(self) -> typing.Dict[str, Contract]:
+        if self._paper_contracts is not None:
+            return dict(self._paper_contracts)
+
+        return super().get_contracts()
+
+    def _start_ws(self):
+        if self._live:
+            super()._start_ws()
+
+    def _on_message(self, ws, msg: str):
+        now = self._replay_time if self._replay_time is not None else int(time.time() * 1000)
+
+        if self._record_file is not None:
+            self._record_file.write(f"{now}\t{msg}\n")
+
+        data = json.loads(msg)
+
+        # The engine sees the event before the strategies, their orders can't be filled by the event they react to
+
+        if data.get('e') == "bookTicker" or ("u" in data and "A" in data):
+            self.engine.on_book(data['s'], float(data['b']), float(data['a']),
+                                float(data['B']) if "B" in data else None, float(data['A']) if "A" in data else None,
+                                now)
+
+        elif data.get('e') == "aggTrade":
+            self.engine.on_trade(data['s'], float(data['p']), float(data['q']),
+                                 ("sell" if data['m'] else "buy") if "m" in data else None, now)
+
+        elif isinstance(data.get('result'), dict) and data['result'].get('channel') == "trade":
+            symbol = data['result']['instrument_name']
+            for t in data['result']['data']:
+                self.engine.on_trade(symbol, float(t['p']), float(t['q']), t['s'].lower() if "s" in t else None, now)
+
+        super()._on_message(ws, msg)
+
+    def _make_request(self, method: str, endpoint: str, data: typing.Dict):
+        route = endpoint.rsplit("/", 1)[-1]
+
+        if "/" + route not in ORDER_ENDPOINTS:
+            return super()._make_request(method, endpoint, data)
+
+        if route == "order" and method == "POST":
+            return self._paper_place(data)
+
+        elif route == "cancel-order":
+            order = self.engine.cancel(data['order_id'])
+            return order.to_response() if order is not None else None
+
+        elif route in ("get-orders", "get-order"):
+            order = self.engine.orders.get(data['orderId'])
+            return order.to_response() if order is not None else None
+
+        elif route == "get-accounts":
+            return {"assets": [{"asset": asset, "initialMargin": 0, "total_margin_balance": balance,
+                                "total_available_balance": balance, "total_session_unrealized_pnl": 0}
+                               for asset, balance in list(self._paper_balances.items())]}
+
+        return None
+
+    def get_trade_size(self, contract: Contract, price: float, balance_pct: float):
+        balances = self.get_balances()
+
+        if contract.quote_asset not in balances:
+            return None
+
+        trade_size = (balances[contract.quote_asset].wallet_balance * balance_pct / 100) / price
+
+        return round(round(trade_size / contract.lot_size) * contract.lot_size, 8)
+
+    def _paper_place(self, data: typing.Dict) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        contract = self.contracts.get(data['instrument_name'])
+
+        if contract is None or data['type'] not in ("MARKET", "LIMIT") or data['quantity'] <= 0:
+            return None
+
+        price = float(data['prices']) if data['type'] == "LIMIT" and "prices" in data else None
+
+        order = SimOrder(next(self._paper_ids), contract, data['side'].lower(), price, data['quantity'])
+        self.engine.submit(order)
+
+        return order.to_response()
+
+    def _on_paper_fill(self, order: SimOrder, quantity: float, price: float, fee: float):
+
+        """
+        Update the simulated balances, fees are paid in the quote asset.
+        """
+
+        base, quote = order.contract.base_asset, order.contract.quote_asset
+        sign = 1 if order.side == "buy" else -1
+
+        self._paper_balances[base] = self._paper_balances.get(base, 0.0) + sign * quantity
+        self._paper_balances[quote] = self._paper_balances.get(quote, 0.0) - sign * quantity * price - fee
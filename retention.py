@@ -0,0 +1,145 @@
+import collections
+import sys
+import types
+import typing
+
+from models import *
+
+if typing.TYPE_CHECKING:
+    from CryptoCom import CryptoComClient
+
+
+# How much of the session history is kept in memory. Everything older is either in the SQLite files (candles,
+# trades, orders), in info.log (logs) or gone.
+DEFAULT_RETENTION = {
+    "candles": 1000,  # Candles per strategy, never less than what its indicators need
+    "closed_trades": 50,  # Closed trades per strategy, all of them are in the trade journal
+    "strategy_logs": 200,  # Log messages per strategy
+    "client_logs": 500,  # Log messages of the connector
+    "trade_rows": 200,  # Closed trades displayed by the interface
+    "analytics_buckets": 720,  # Hourly and daily PnL buckets per strategy and instrument, i.e. 30 days of hourly ones
+}
+
+TRIM_SLACK = 100  # Lists are trimmed once they exceed their limit by this much, so that trimming is amortized
+
+
+def deep_size(obj: typing.Any, seen: typing.Optional[typing.Set[int]] = None) -> int:
+
+    """
+    Approximate number of bytes used by an object and everything it references: containers, __dict__ and __slots__.
+    Shared objects are only counted once per seen set. Contracts referenced by obj, functions, classes and modules
+    are not followed, they belong to the connector and not to the component measured.
+    The containers are copied before being walked: the other threads keep appending to them while they are measured.
+    :param obj:
+    :param seen: Ids of the objects already counted, share it to measure several components without double counting
+    :return:
+    """
+
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+
+    while len(stack) > 0:
+        current = stack.pop()
+
+        if id(current) in seen:
+            continue
+
+        if current is not obj and isinstance(current, (Contract, type, types.ModuleType, types.FunctionType,
+                                                       types.MethodType)):
+            continue
+
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            for key, value in list(current.items()):  # A single C call, atomic under the GIL
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(current, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(list(current))
+        elif not isinstance(current, (str, bytes, int, float, bool)):
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+
+    return size
+
+
+def resident_memory() -> typing.Optional[int]:
+
+    """
+    Resident set size of the process in bytes, read from /proc on Linux, the peak RSS elsewhere.
+    :return: None if it can't be read on this platform
+    """
+
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, kilobytes on Linux
+
+
+def memory_report(client: "CryptoComClient") -> typing.Dict[str, typing.Any]:
+
+    """
+    Memory used by each component of the connector and its strategies, to check that a long session stays flat.
+    Walks the objects, so it costs a few milliseconds per thousand candles: call it on demand, not in the hot path.
+    :param client:
+    :return: {"rss": bytes or None, "components": {name: {"items": count, "bytes": size}}}
+    """
+
+    seen: typing.Set[int] = set()
+    components = dict()
+
+    def add(name: str, obj: typing.Any):
+        components[name] = {"items": len(obj), "bytes": deep_size(obj, seen)}
+
+    for key, strat in list(client.strategies.items()):
+        prefix = f"strategy {key} {strat.strat_name} {strat.contract.symbol} {strat.tf}"
+        add(f"{prefix} candles", strat.candles)
+        add(f"{prefix} trades", strat.trades)
+        add(f"{prefix} logs", strat.logs)
+
+    add("client logs", client.logs)
+    add("log queue", client.log_queue)
+    add("prices", client.prices)
+
+    contracts = list(client.contracts.values())
+    components["contracts"] = {"items": len(contracts),
+                               "bytes": deep_size(client.contracts, seen) + sum(deep_size(c, seen) for c in contracts)}
+    add("balances", client.balances if client.balances is not None else dict())
+    add("unfilled orders", client._unfilled_orders)
+    add("analytics buckets", client.analytics._buckets)
+
+    return {"rss": resident_memory(), "components": components}
+
+
+def format_report(report: typing.Dict[str, typing.Any]) -> str:
+    lines = []
+
+    for name, component in sorted(report['components'].items(), key=lambda item: -item[1]['bytes']):
+        lines.append(f"{name}: {component['items']} items, {component['bytes'] / 1024:.1f} KiB")
+
+    total = sum(component['bytes'] for component in report['components'].values())
+    lines.append(f"Total measured: {total / 1024 / 1024:.2f} MiB")
+
+    if report['rss'] is not None:
+        lines.append(f"Resident memory: {report['rss'] / 1024 / 1024:.1f} MiB")
+
+    return "\n".join(lines)
@@ -0,0 +1,162 @@
+import collections
+import threading
+import time
+import typing
+
+from models import *
+
+
+# None disables a check. Notional amounts are in quote currency.
+DEFAULT_RISK_LIMITS = {
+    "max_notional_per_instrument": None,
+    "max_notional_per_quote": None,
+    "max_notional_account": None,  # Sum of the notional of all the positions, whatever their quote currency
+    "max_open_positions": None,
+    "max_orders_per_sec": 5,
+    "price_band_pct": 5.0,  # Maximum distance between the order price and the current mid price (fat-finger check)
+}
+
+
+class RiskEngine:
+    def __init__(self, limits: typing.Optional[typing.Dict[str, typing.Optional[float]]] = None):
+
+        """
+        Pre-trade checks of the order path.
+        Exposure is kept as running aggregates per instrument, quote currency and account, updated on fills, so that
+        every check costs constant time and doesn't need any REST call.
+        Orders that reduce an existing position are never blocked, so that a position can always be exited: they
+        still count towards the orders/sec limit of the other orders.
+        :param limits: Overrides of DEFAULT_RISK_LIMITS
+        """
+
+        self.limits = dict(DEFAULT_RISK_LIMITS)
+        if limits is not None:
+            self.limits.update(limits)
+
+        self._lock = threading.Lock()  # Orders are placed from the websocket thread and from the scheduler thread
+
+        self._positions: typing.Dict[str, float] = dict()  # Signed quantity per instrument
+        self._instrument_notional: typing.Dict[str, float] = dict()  # Entry cost of the position per instrument
+        self._quote_notional: typing.Dict[str, float] = collections.defaultdict(float)
+        self._account_notional = 0.0
+        self._open_positions = 0
+
+        self._order_times: typing.Deque[float] = collections.deque()  # Orders accepted during the last second
+
+        self.rejections: typing.Dict[str, int] = collections.defaultdict(int)  # Number of rejected orders per check
+
+    def check_order(self, contract: Contract, side: str, quantity: float, price: typing.Optional[float],
+                    reference_price: typing.Optional[float]) -> typing.Optional[str]:
+
+        """
+        Run the pre-trade checks. An accepted order counts towards the orders/sec limit.
+        :param contract:
+        :param side: buy or sell
+        :param quantity:
+        :param price: Limit price, None for a market order
+        :param reference_price: Current mid price of the instrument, None if unknown
+        :return: None if the order is accepted, otherwise the reason of the rejection
+        """
+
+        signed_qty = quantity if side.lower() == "buy" else -quantity
+
+        with self._lock:
+            now = time.monotonic()
+
+            while len(self._order_times) > 0 and now - self._order_times[0] >= 1:
+                self._order_times.popleft()
+
+            reason = self._check(contract, signed_qty, price, reference_price)
+
+            if reason is None:
+                self._order_times.append(now)
+            else:
+                self.rejections[reason] += 1
+
+        return reason
+
+    def _check(self, contract: Contract, signed_qty: float, price: typing.Optional[float],
+               reference_price: typing.Optional[float]) -> typing.Optional[str]:
+
+        limits = self.limits
+
+        position = self._positions.get(contract.symbol, 0)
+
+        if position != 0 and position * signed_qty < 0 and abs(signed_qty) <= abs(position):
+            return None  # Reduces the current position
+
+        if limits['max_orders_per_sec'] is not None and len(self._order_times) >= limits['max_orders_per_sec']:
+            return "max orders/sec"
+
+        if limits['price_band_pct'] is not None and price is not None and reference_price:
+            if abs(price - reference_price) / reference_price * 100 > limits['price_band_pct']:
+                return "price band"
+
+        order_price = price if price is not None else reference_price
+
+        if order_price is not None:
+            notional = abs(signed_qty) * order_price
+
+            if limits['max_notional_per_instrument'] is not None and \
+                    self._instrument_notional.get(contract.symbol, 0) + notional > limits['max_notional_per_instrument']:
+                return "max notional per instrument"
+
+            if limits['max_notional_per_quote'] is not None and \
+                    self._quote_notional[contract.quote_asset] + notional > limits['max_notional_per_quote']:
+                return "max notional per quote currency"
+
+            if limits['max_notional_account'] is not None and \
+                    self._account_notional + notional > limits['max_notional_account']:
+                return "max notional per account"
+
+        if limits['max_open_positions'] is not None and position == 0 and \
+                self._open_positions >= limits['max_open_positions']:
+            return "max open positions"
+
+        return None
+
+    def on_fill(self, contract: Contract, side: str, quantity: float, price: float):
+
+        """
+        Update the exposure aggregates with an executed order.
+        :param contract:
+        :param side: buy or sell
+        :param quantity: Executed quantity
+        :param price: Average execution price
+        :return:
+        """
+
+        signed_qty = quantity if side.lower() == "buy" else -quantity
+
+        with self._lock:
+            position = self._positions.get(contract.symbol, 0)
+            notional = self._instrument_notional.get(contract.symbol, 0)
+
+            new_position = position + signed_qty
+
+            if position == 0 or position * signed_qty > 0:  # Opens or increases the position
+                new_notional = notional + quantity * price
+            elif position * new_position > 0:  # Reduces the position, the entry cost decreases proportionally
+                new_notional = notional * new_position / position
+            else:  # Closes the position, or flips it to the other side
+                new_notional = abs(new_position) * price
+
+            if abs(new_position) < contract.lot_size / 2:
+                new_position = 0
+                new_notional = 0
+
+            self._positions[contract.symbol] = new_position
+            self._instrument_notional[contract.symbol] = new_notional
+            self._quote_notional[contract.quote_asset] += new_notional - notional
+            self._account_notional += new_notional - notional
+
+            if position == 0 and new_position != 0:
+                self._open_positions += 1
+            elif position != 0 and new_position == 0:
+                self._open_positions -= 1
+
+    def exposure(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {"positions": dict(self._positions), "notional_per_instrument": dict(self._instrument_notional),
+                    "notional_per_quote": dict(self._quote_notional), "notional_account": self._account_notional,
+                    "open_positions": self._open_positions}
@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter.messagebox import askquestion
 import logging
 import json
+import time
+import typing
 
 
 from CryptoCom import CryptoComClient
@@ -11,13 +13,25 @@ from logging_component import Logging
 from watchlist_component import Watchlist
 from trades_component import TradesWatch
 from strategy_component import StrategyEditor
+from analytics_component import AnalyticsPanel
+from metrics import UI_LOOP, UI_LOG_INSERT
+from retention import memory_report, format_report
 
 
 logger = logging.getLogger()  # This will be the same logger object as the one configured in main.py
 
+# Minimum seconds between two refreshes of each part of the interface, and maximum seconds between two checks for
+# changes when nothing happens. "latency" displays the changes sooner, "cpu" redraws less often.
+REFRESH_PROFILES = {
+    "latency": {"prices": 0.1, "logs": 0.25, "trades": 0.5, "idle": 0.5},
+    "cpu": {"prices": 0.5, "logs": 1.0, "trades": 2.0, "idle": 2.0},
+}
+
+PROFILE_DURATION = 10  # Seconds sampled by the Analytics > Profile threads menu command
+
 
 class Root(tk.Tk):
-    def __init__(self, CryptoCom: CryptoComClient):
+    def __init__(self, CryptoCom: CryptoComClient, refresh_profile: str = "latency"):
         super().__init__()
 
         self.CryptoCom = CryptoCom
@@ -37,6 +51,20 @@ class Root(tk.Tk):
         self.main_menu.add_cascade(label="Workspace", menu=self.workspace_menu)
         self.workspace_menu.add_command(label="Save workspace", command=self._save_workspace)
 
+        self.analytics_menu = tk.Menu(self.main_menu, tearoff=False)
+        self.main_menu.add_cascade(label="Analytics", menu=self.analytics_menu)
+        self.analytics_menu.add_command(label="Performance", command=self._show_analytics)
+        self.analytics_menu.add_command(label="Memory report", command=self._show_memory)
+        self.analytics_menu.add_command(label="Profile threads (10 s)", command=self._start_profile)
+
+        self._refresh_profile = tk.StringVar(value=refresh_profile)
+
+        self.interface_menu = tk.Menu(self.main_menu, tearoff=False)
+        self.main_menu.add_cascade(label="Interface", menu=self.interface_menu)
+        self.interface_menu.add_radiobutton(label="Low latency refresh", variable=self._refresh_profile,
+                                            value="latency")
+        self.interface_menu.add_radiobutton(label="Low CPU refresh", variable=self._refresh_profile, value="cpu")
+
         # Separates the root component in two blocks
 
         self._left_frame = tk.Frame(self, bg=BG_COLOR)
@@ -56,9 +84,13 @@ class Root(tk.Tk):
         self._strategy_frame = StrategyEditor(self, self.CryptoCom, self._right_frame, bg=BG_COLOR)
         self._strategy_frame.pack(side=tk.TOP, pady=15)
 
-        self._trades_frame = TradesWatch(self._right_frame, bg=BG_COLOR)
+        self._trades_frame = TradesWatch(self._right_frame, bg=BG_COLOR,
+                                         max_closed_rows=self.CryptoCom.retention['trade_rows'])
         self._trades_frame.pack(side=tk.TOP, pady=15)
 
+        self._last_refresh = {"prices": 0.0, "logs": 0.0, "trades": 0.0}
+        self._poll_delay = 0.0  # Grows while nothing changes, up to the "idle" delay of the refresh profile
+
         self._update_ui()  # Starts the infinite interface update loop
 
     def _ask_before_close(self):
@@ -75,68 +107,115 @@ class Root(tk.Tk):
             self.CryptoCom.reconnect = False
             self.CryptoCom.ws.close()
             self.CryptoCom.ws.close()
+            self.CryptoCom.scheduler.stop()
+
+            if self.CryptoCom.workers is not None:
+                self.CryptoCom.workers.stop()
+
+            self.CryptoCom.journal.stop()  # Writes the trades and orders still waiting in the queue
 
             self.destroy()  # Destroys the UI and terminates the program as no other thread is running
 
     def _update_ui(self):
 
         """
-        Called by itself every 1500 seconds. It is similar to an infinite loop but runs within the same Thread
+        Called by itself with a variable delay. It is similar to an infinite loop but runs within the same Thread
         as .mainloop() thanks to the .after() method, thus it is "thread-safe" to update elements of the interface
         in this method. Do not update Tkinter elements from another Thread like the websocket thread.
+        Only the parts of the interface notified as changed on the CryptoCom.updates bus are refreshed, each one at most
+        once per interval of the refresh profile, all the changes received in between being displayed at once.
         :return:
         """
 
-        # Logs
+        loop_start = time.perf_counter()
 
-        for log in self.CryptoCom.logs:
-            if not log['displayed']:
-                self.logging_frame.add_log(log['log'])
-                log['displayed'] = True
+        profile = REFRESH_PROFILES[self._refresh_profile.get()]
+        now = time.monotonic()
 
-        for log in self.CryptoCom.logs:
-            if not log['displayed']:
-                self.logging_frame.add_log(log['log'])
-                log['displayed'] = True
+        notified = self.CryptoCom.updates.pending()
+        pending = set(notified)
+        next_delay = profile['idle']
 
-        # Trades and Logs
+        # Watchlist rows without a price yet are checked at least every "idle" delay to subscribe to their symbol
+        if now - self._last_refresh['prices'] >= profile['idle']:
+            pending.add("prices")
 
-        for client in [self.CryptoCom]:
+        for topic in ("logs", "trades", "prices"):
+            if topic not in pending:
+                continue
 
-            try:  # try...except statement to handle the case when a dictionary is updated during the following loops
+            due = self._last_refresh[topic] + profile[topic]
 
-                for b_index, strat in client.strategies.items():
-                    for log in strat.logs:
-                        if not log['displayed']:
-                            self.logging_frame.add_log(log['log'])
-                            log['displayed'] = True
+            if now < due:  # Refreshed too recently, the changes wait for the next frame of this topic
+                next_delay = min(next_delay, due - now)
+                continue
 
-                    # Update the Trades component (add a new trade, change status/PNL)
+            if topic == "logs":
+                self._refresh_logs()
+            elif topic == "trades":
+                self._refresh_trades()
+            else:
+                self._refresh_prices(self.CryptoCom.updates.collect("prices"))
 
-                    for trade in strat.trades:
-                        if trade.time not in self._trades_frame.body_widgets['symbol']:
-                            self._trades_frame.add_trade(trade)
+            self._last_refresh[topic] = now
 
-                        if "CryptoCom" in trade.contract.exchange:
-                            precision = trade.contract.price_decimals
-                        else:
-                            precision = 8  # The CryptoCom PNL is always is BTC, thus 8 decimals
+        # Adaptive polling: checks again soon after a change, then less and less often while nothing happens
 
-                        pnl_str = "{0:.{prec}f}".format(trade.pnl, prec=precision)
-                        self._trades_frame.body_widgets['realized_pnl'][trade.time].set(pnl_str)
-                        self._trades_frame.body_widgets['status'][trade.time].set(trade.status.capitalize())
-                        self._trades_frame.body_widgets['quantity'][trade.time].set(trade.quantity)
+        if len(notified) > 0:
+            self._poll_delay = min(profile.values())
+        else:
+            self._poll_delay = min(max(self._poll_delay * 2, min(profile.values())), profile['idle'])
 
-            except RuntimeError as e:
-                logger.error("Error while looping through strategies dictionary: %s", e)
+        next_delay = min(next_delay, self._poll_delay)
 
-        # Watchlist prices
+        UI_LOOP.observe(time.perf_counter() - loop_start)
 
-        try:
-            for key, value in self._watchlist_frame.body_widgets['symbol'].items():
+        self.after(max(int(next_delay * 1000), 1), self._update_ui)
+
+    def _refresh_logs(self):
+
+        """
+        Display the new messages published by the connector and its strategies since the last call.
+        :return:
+        """
+
+        log_start = time.perf_counter()
+
+        self.CryptoCom.updates.collect("logs")
+
+        log_queue = self.CryptoCom.log_queue
+        new_logs = []
+
+        while len(log_queue) > 0:
+            new_logs.append(log_queue.popleft())
+
+        self.logging_frame.add_logs(new_logs)  # Single insert in the tk.Text widget for all the new messages
+
+        UI_LOG_INSERT.observe(time.perf_counter() - log_start)  # Compared with ui_loop_seconds: cost of the logs
+
+    def _refresh_trades(self):
+
+        """
+        Update the rows of the trades that changed since the last call (new trade, status/PNL change).
+        :return:
+        """
+
+        for client in [self.CryptoCom]:
+            client.updates.collect("trades")
+
+            for trade in client.pop_dirty_trades():
+                self._trades_frame.update_trade(trade)
+
+    def _refresh_prices(self, changed_symbols: typing.Set[str]):
+
+        """
+        Update the Watchlist prices of the symbols whose bid or ask changed since the last call.
+        :param changed_symbols:
+        :return:
+        """
 
-                symbol = self._watchlist_frame.body_widgets['symbol'][key].cget("text")
-                exchange = self._watchlist_frame.body_widgets['exchange'][key].cget("text")
+        try:
+            for key, symbol, exchange in self._watchlist_frame.symbols():
 
                 if exchange == "CryptoCom":
                     if symbol not in self.CryptoCom.contracts:
@@ -149,15 +228,7 @@ class Root(tk.Tk):
                         self.CryptoCom.get_bid_ask(self.CryptoCom.contracts[symbol])
                         continue
 
-                    precision = self.CryptoCom.contracts[symbol].price_decimals
-
-                    prices = self.CryptoCom.prices[symbol]
-
-                elif exchange == "CryptoCom":
-                    if symbol not in self.CryptoCom.contracts:
-                        continue
-
-                    if symbol not in self.CryptoCom.prices:
+                    if symbol not in changed_symbols and self._watchlist_frame.has_prices(key):
                         continue
 
                     precision = self.CryptoCom.contracts[symbol].price_decimals
@@ -167,23 +238,67 @@ class Root(tk.Tk):
                 else:
                     continue
 
-                if prices['bids'] is not None:
-                    price_str = "{0:.{prec}f}".format(prices['bids'], prec=precision)
-                    self._watchlist_frame.body_widgets['bid_var'][key].set(price_str)
-                if prices['asks'] is not None:
-                    price_str = "{0:.{prec}f}".format(prices['asks'], prec=precision)
-                    self._watchlist_frame.body_widgets['asks'][key].set(price_str)
+                bid_str = "{0:.{prec}f}".format(prices['bids'], prec=precision) if prices['bids'] is not None else ""
+                ask_str = "{0:.{prec}f}".format(prices['asks'], prec=precision) if prices['asks'] is not None else ""
+
+                self._watchlist_frame.set_prices(key, bid_str, ask_str)  # Only visible rows touch their widgets
 
         except RuntimeError as e:
             logger.error("Error while looping through watchlist dictionary: %s", e)
 
-        self.after(1500, self._update_ui)
+    def _show_analytics(self):
+
+        """
+        Open the performance panel in a separate window, triggered from a Menu command.
+        :return:
+        """
+
+        analytics_window = tk.Toplevel(self)
+        analytics_window.wm_title("Performance")
+        analytics_window.config(bg=BG_COLOR)
+
+        panel = AnalyticsPanel(self.CryptoCom.analytics, analytics_window, bg=BG_COLOR)
+        panel.pack(side=tk.TOP, padx=10, pady=10)
+
+    def _show_memory(self):
+
+        """
+        Open the memory used by each component in a separate window, triggered from a Menu command.
+        :return:
+        """
+
+        report = format_report(memory_report(self.CryptoCom))
+
+        memory_window = tk.Toplevel(self)
+        memory_window.wm_title("Memory")
+        memory_window.config(bg=BG_COLOR)
+
+        text = tk.Text(memory_window, height=len(report.splitlines()) + 1, width=80, state=tk.NORMAL, bg=BG_COLOR,
+                       fg=FG_COLOR_2, font=GLOBAL_FONT, highlightthickness=False, bd=0)
+        text.insert("1.0", report)
+        text.configure(state=tk.DISABLED)
+        text.pack(side=tk.TOP, padx=10, pady=10)
+
+    def _start_profile(self):
+
+        """
+        Sample the stacks of all the threads for a few seconds and write them to a flame graph file, triggered from a
+        Menu command.
+        :return:
+        """
+
+        path = self.CryptoCom.profiler.start(PROFILE_DURATION)
+
+        if path is None:
+            self.logging_frame.add_log("A profile is already running", level="WARNING")
+        else:
+            self.logging_frame.add_log(f"Profiling the threads for {PROFILE_DURATION} seconds, output: {path}")
 
     def _save_workspace(self):
 
         """
         Collect the current data on the interface and saves it to the SQLite database to avoid setting up everything
-        again everytime you open the program.
+        again everytime you open the program. Only the rows that changed are written, in a background thread.
         Triggered from a Menu command.
         :return:
         """
@@ -192,10 +307,7 @@ class Root(tk.Tk):
 
         watchlist_symbols = []
 
-        for key, value in self._watchlist_frame.body_widgets['symbol'].items():
-            symbol = value.cget("text")
-            exchange = self._watchlist_frame.body_widgets['exchange'][key].cget("text")
-
+        for key, symbol, exchange in self._watchlist_frame.symbols():
             watchlist_symbols.append((symbol, exchange,))
 
         self._watchlist_frame.db.save("watchlist", watchlist_symbols)
@@ -224,8 +336,8 @@ class Root(tk.Tk):
 
                 extra_params[code_name] = self._strategy_frame.additional_parameters[b_index][code_name]
 
-            strategies.append((strategy_type, contract, timeframe, balance_pct, take_profit, stop_loss,
-                               json.dumps(extra_params),))
+            strategies.append((self._strategy_frame.row_keys[b_index], strategy_type, contract, timeframe,
+                               balance_pct, take_profit, stop_loss, json.dumps(extra_params),))
 
         self._strategy_frame.db.save("strategies", strategies)
 
@@ -0,0 +1,100 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import typing
+
+
+logger = logging.getLogger()
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, directory: str = "profiles"):
+
+        """
+        Profiler that can be started while the program runs: a background thread takes the stack of every other
+        thread (websocket, interface, scheduler, journal...) every interval seconds, nothing is measured when it
+        isn't running.
+        The result is written in the collapsed stack format, one line per distinct stack:
+        thread;outermost function;...;innermost function count
+        which flamegraph.pl, speedscope or inferno turn into a flame graph.
+        :param interval: Seconds between two samples
+        :param directory: Where the profiles are written
+        """
+
+        self._interval = interval
+        self._directory = directory
+
+        self._thread: typing.Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float) -> typing.Optional[str]:
+
+        """
+        Sample the threads during duration seconds, in the background.
+        :param duration: In seconds
+        :return: Path of the file that will be written, None if a profile is already running
+        """
+
+        if self.running:
+            return None
+
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration, path), name="profiler", daemon=True)
+        self._thread.start()
+
+        logger.info("Profiling all the threads for %s seconds, output: %s", duration, path)
+
+        return path
+
+    def stop(self):
+
+        """
+        End the current profile early, what was sampled so far is written.
+        :return:
+        """
+
+        self._stop.set()
+
+    def _run(self, duration: float, path: str):
+        stacks: typing.Dict[str, int] = collections.defaultdict(int)
+        own_id = threading.get_ident()
+
+        end = time.monotonic() + duration
+        samples = 0
+
+        while time.monotonic() < end and not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+
+                functions = []
+                while frame is not None:
+                    code = frame.f_code
+                    functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+
+                functions.append(names.get(thread_id, str(thread_id)))
+                functions.reverse()  # Outermost first
+
+                stacks[";".join(f.replace(";", ":") for f in functions)] += 1
+
+            samples += 1
+            self._stop.wait(self._interval)
+
+        with open(path, "w") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        logger.info("Profile written to %s (%s samples)", path, samples)
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import typing
+
+
+logger = logging.getLogger()
+
+
+class _Task:
+    __slots__ = ("key", "callback", "interval", "cancelled")
+
+    def __init__(self, key: typing.Hashable, callback: typing.Callable, interval: typing.Optional[float]):
+        self.key = key
+        self.callback = callback
+        self.interval = interval  # None for a one-shot task
+        self.cancelled = False
+
+
+class Scheduler:
+    def __init__(self, name: str = "scheduler"):
+
+        """
+        Single thread running all the delayed and periodic work (order status polling, balance reconciliation...)
+        instead of one threading.Timer per call.
+        Tasks are kept in a heap ordered by due time. A task scheduled with the key of a task that is already pending
+        is coalesced into the pending one.
+        :param name: Name of the thread
+        """
+
+        self._heap: typing.List[typing.Tuple[float, int, _Task]] = []
+        self._tasks: typing.Dict[typing.Hashable, _Task] = dict()  # Pending tasks by key
+        self._seq = itertools.count()
+
+        self._cond = threading.Condition()
+        self._running = True
+
+        # Metrics
+
+        self.executed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.lag_last = 0.0  # Seconds between the due time of the last task and the moment it actually ran
+        self.lag_max = 0.0
+        self._lag_total = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay: float, callback: typing.Callable, key: typing.Optional[typing.Hashable] = None) \
+            -> typing.Hashable:
+
+        """
+        Run a callback once, after a delay.
+        :param delay: In seconds
+        :param callback: Function without arguments
+        :param key: Identifies the task to coalesce duplicates and to cancel it, generated if None
+        :return: The key of the task
+        """
+
+        return self._schedule(delay, callback, key, None)
+
+    def call_every(self, interval: float, callback: typing.Callable, key: typing.Optional[typing.Hashable] = None,
+                   first_delay: typing.Optional[float] = None) -> typing.Hashable:
+
+        """
+        Run a callback periodically until the task is cancelled.
+        :param interval: In seconds
+        :param callback: Function without arguments
+        :param key: Identifies the task to coalesce duplicates and to cancel it, generated if None
+        :param first_delay: Delay before the first run, the interval by default
+        :return: The key of the task
+        """
+
+        return self._schedule(interval if first_delay is None else first_delay, callback, key, interval)
+
+    def _schedule(self, delay: float, callback: typing.Callable, key: typing.Optional[typing.Hashable],
+                  interval: typing.Optional[float]) -> typing.Hashable:
+
+        with self._cond:
+            seq = next(self._seq)
+
+            if key is None:
+                key = ("task", seq)
+            elif key in self._tasks:
+                self.coalesced += 1
+                return key
+
+            task = _Task(key, callback, interval)
+            self._tasks[key] = task
+            heapq.heappush(self._heap, (time.monotonic() + delay, seq, task))
+
+            if self._heap[0][2] is task:  # Wakes up the thread only if the new task is the next one to run
+                self._cond.notify()
+
+        return key
+
+    def cancel(self, key: typing.Hashable) -> bool:
+
+        """
+        Cancel a pending task. The heap entry is discarded lazily when it comes up.
+        :param key:
+        :return: True if a task was pending with this key
+        """
+
+        with self._cond:
+            task = self._tasks.pop(key, None)
+            if task is None:
+                return False
+            task.cancelled = True
+            self.cancelled += 1
+
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def metrics(self) -> typing.Dict[str, float]:
+        return {"pending": self.pending, "executed": self.executed, "coalesced": self.coalesced,
+                "cancelled": self.cancelled, "failed": self.failed, "lag_last": self.lag_last,
+                "lag_max": self.lag_max, "lag_avg": self._lag_total / self.executed if self.executed > 0 else 0.0}
+
+    def _run(self):
+
+        """
+        Wait for the next due task and run it, until stop() is called.
+        :return:
+        """
+
+        while True:
+            with self._cond:
+                while self._running:
+                    if len(self._heap) == 0:
+                        self._cond.wait()
+                        continue
+
+                    wait_time = self._heap[0][0] - time.monotonic()
+                    if wait_time <= 0:
+                        break
+                    self._cond.wait(wait_time)
+
+                if not self._running:
+                    return
+
+                due, seq, task = heapq.heappop(self._heap)
+
+                if task.cancelled:
+                    continue
+
+                if task.interval is None:
+                    del self._tasks[task.key]  # Lets the callback schedule a new task with the same key
+
+            lag = time.monotonic() - due
+
+            self.executed += 1
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self._lag_total += lag
+
+            try:
+                task.callback()
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error while running scheduled task %s: %s", task.key, e)
+
+            if task.interval is not None:
+                with self._cond:
+                    if not task.cancelled:
+                        next_due = max(due + task.interval, time.monotonic())  # Skips the missed runs
+                        heapq.heappush(self._heap, (next_due, next(self._seq), task))
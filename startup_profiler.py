@@ -0,0 +1,48 @@
+import logging
+import sys
+import time
+import typing
+
+
+logger = logging.getLogger()
+
+
+class StartupProfiler:
+    def __init__(self):
+
+        """
+        Splits the time from the program start to the first interface frame into named phases (imports, REST calls
+        and databases loading, widgets construction...), with the number of modules imported during each phase.
+        Create it before the imports to measure.
+        """
+
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._last_modules = len(sys.modules)
+
+        self.phases: typing.List[typing.Tuple[str, float, int]] = []  # (name, seconds, modules imported)
+
+    def mark(self, phase: str):
+
+        """
+        Close the current phase, which started at the previous mark (or at the creation of the profiler).
+        :param phase: Name of the phase that just ended
+        :return:
+        """
+
+        now = time.perf_counter()
+        modules = len(sys.modules)
+
+        self.phases.append((phase, now - self._last, modules - self._last_modules))
+
+        self._last = now
+        self._last_modules = modules
+
+    def report(self):
+        total = self._last - self._start
+
+        logger.info("Startup time: %.3f s", total)
+
+        for phase, duration, modules in self.phases:
+            logger.info("  %-30s %8.3f s %5.1f %% %5d modules", phase, duration,
+                        duration / total * 100 if total > 0 else 0.0, modules)
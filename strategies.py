@@ -1,12 +1,13 @@
 import logging
 from typing import *
 import time
-
-from threading import Timer
-
-import pandas as pd
+import bisect
+import collections
 
 from models import *
+from trigger_index import TriggerIndex
+from metrics import SIGNALS
+from retention import TRIM_SLACK
 
 if TYPE_CHECKING:  # Import the connector class names only for typing purpose (the classes aren't actually imported)
     
@@ -33,16 +34,27 @@ class Strategy:
         self.stop_loss = stop_loss
 
         self.strat_name = strat_name
+        self.strategy_id: Optional[str] = None  # Persistent id of this strategy instance, set by start_strategy()
+
+        self.warmup_candles = 1000  # Number of historical candles loaded when the strategy starts
+        self.min_candles = 2  # Candles needed by the indicators, the retention never keeps fewer
 
         self.ongoing_position = False
+        self.remote_signals = False  # True when a worker process computes the signals, see strategy_workers.py
 
         self.candles: List[Candle] = []
         self.trades: List[Trade] = []
-        self.logs = []
+        self.logs: Deque[Dict[str, str]] = collections.deque(maxlen=client.retention['strategy_logs'])
+
+        self._triggers = TriggerIndex()  # Take profit / Stop loss prices of the open trades
 
-    def _add_log(self, msg: str):
-        logger.info("%s", msg)
-        self.logs.append({"log": msg, "displayed": False})
+    def _add_log(self, msg: str, level: str = "INFO"):
+        logger.log(logging.getLevelName(level), "%s", msg, stacklevel=2, extra={"dedup": False})  # Caller's site
+
+        log = {"log": msg, "level": level, "source": f"{self.strat_name} {self.contract.symbol} {self.tf}"}
+        self.logs.append(log)
+        self.client.log_queue.append(log)  # Displayed by the interface
+        self.client.updates.notify("logs")
 
     def parse_trades(self, price: float, size: float, timestamp: int) -> str:
 
@@ -75,15 +87,98 @@ class Strategy:
 
             # Check Take profit / Stop loss
 
-            for trade in self.trades:
-                if trade.status == "open" and trade.entry_price is not None:
-                    self._check_tp_sl(trade)
+            self._check_tp_sl(price)
 
             return "same_candle"
 
+        # New Candle or Missing Candle(s)
+
+        else:
+            self._new_candle(price, size, timestamp)
+
+            return "new_candle"
+
+    def parse_trades_batch(self, trades: List[Tuple[float, float, int]]) -> str:
+
+        """
+        Parse a burst of trades coming in from the websocket in one pass.
+        The trades are folded into the Candle list one run at a time (a run being the consecutive trades that belong
+        to the same candlestick), with min/max/sum computed over the whole run instead of trade by trade.
+        Take profit / Stop loss are checked once per batch against the price extremes of the batch.
+        :param trades: List of (price, size, timestamp) tuples, timestamps being Unix timestamps in milliseconds
+        :return: new_candle if at least one candlestick was opened during the batch, same_candle otherwise
+        """
+
+        if len(trades) == 0:
+            return "same_candle"
+
+        trades = sorted(trades, key=lambda t: t[2])  # Cheap when the exchange already sends them ordered
+
+        prices = [t[0] for t in trades]
+        sizes = [t[1] for t in trades]
+        timestamps = [t[2] for t in trades]
+
+        timestamp_diff = int(time.time() * 1000) - timestamps[-1]
+        if timestamp_diff >= 2000:
+            logger.warning("%s %s: %s milliseconds of difference between the current time and the trade time",
+                           self.exchange, self.contract.symbol, timestamp_diff)
+
+        tick_type = "same_candle"
+        same_candle_prices = []  # The prices parse_trades() would have checked the Take profit / Stop loss against
+
+        start = 0
+
+        while start < len(trades):
+            last_candle = self.candles[-1]
+            candle_end = last_candle.timestamp + self.tf_equiv
+
+            if timestamps[start] < candle_end:
+
+                # Same Candle: the run ends with the first trade belonging to the next candlestick
+
+                end = bisect.bisect_left(timestamps, candle_end, start)
+                run_prices = prices[start:end]
+
+                last_candle.close = run_prices[-1]
+                last_candle.volume += sum(sizes[start:end])
+                last_candle.high = max(last_candle.high, max(run_prices))
+                last_candle.low = min(last_candle.low, min(run_prices))
+
+                same_candle_prices.extend(run_prices)
+
+                start = end
+
+            else:
+
+                # New Candle or Missing Candle(s): opened by the first trade of the run, like in parse_trades()
+
+                self._new_candle(prices[start], sizes[start], timestamps[start])
+                tick_type = "new_candle"
+
+                start += 1
+
+        # Check Take profit / Stop loss
+
+        if len(same_candle_prices) > 0:
+            self._check_tp_sl_batch(same_candle_prices)
+
+        return tick_type
+
+    def _new_candle(self, price: float, size: float, timestamp: int):
+
+        """
+        Append a new candlestick opened by a trade, filling the gap with flat candlesticks if some are missing.
+        :param price: The trade price
+        :param size: The trade size
+        :param timestamp: Unix timestamp in milliseconds
+        :return:
+        """
+
+        last_candle = self.candles[-1]
+
         # Missing Candle(s)
 
-        elif timestamp >= last_candle.timestamp + 2 * self.tf_equiv:
+        if timestamp >= last_candle.timestamp + 2 * self.tf_equiv:
 
             missing_candles = int((timestamp - last_candle.timestamp) / self.tf_equiv) - 1
 
@@ -92,39 +187,34 @@ class Strategy:
 
             for missing in range(missing_candles):
                 new_ts = last_candle.timestamp + self.tf_equiv
-                candle_info = {'ts': new_ts, 'open': last_candle.close, 'high': last_candle.close,
-                               'low': last_candle.close, 'close': last_candle.close, 'volume': 0}
-                new_candle = Candle(candle_info, self.tf, "parse_trade")
+                new_candle = Candle.from_values(new_ts, last_candle.close, last_candle.close, last_candle.close,
+                                                last_candle.close, 0)
 
                 self.candles.append(new_candle)
 
                 last_candle = new_candle
 
-            new_ts = last_candle.timestamp + self.tf_equiv
-            candle_info = {'ts': new_ts, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': size}
-            new_candle = Candle(candle_info, self.tf, "parse_trade")
-
-            self.candles.append(new_candle)
-
-            return "new_candle"
+        else:
+            logger.info("%s New candle for %s %s", self.exchange, self.contract.symbol, self.tf)
 
-        # New Candle
+        new_ts = last_candle.timestamp + self.tf_equiv
+        new_candle = Candle.from_values(new_ts, price, price, price, price, size)
 
-        elif timestamp >= last_candle.timestamp + self.tf_equiv:
-            new_ts = last_candle.timestamp + self.tf_equiv
-            candle_info = {'ts': new_ts, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': size}
-            new_candle = Candle(candle_info, self.tf, "parse_trade")
+        self.candles.append(new_candle)
 
-            self.candles.append(new_candle)
+        # Drop the oldest candles, by chunks so that the list isn't shifted at every new candle
 
-            logger.info("%s New candle for %s %s", self.exchange, self.contract.symbol, self.tf)
+        max_candles = max(self.client.retention['candles'], self.min_candles)
 
-            return "new_candle"
+        if len(self.candles) > max_candles + TRIM_SLACK:
+            del self.candles[:len(self.candles) - max_candles]
 
     def _check_order_status(self, order_id):
 
         """
-        Called regularly after an order has been placed, until it is filled.
+        Called regularly after an order has been placed, until it is filled, cancelled, rejected or expired.
+        An order that ends partially filled opens the trade with the executed quantity, one that ends without any fill
+        cancels the trade.
         :param order_id: The order id to check.
         :return:
         """
@@ -135,16 +225,27 @@ class Strategy:
 
             logger.info("%s order status: %s", self.exchange, order_status.status)
 
-            if order_status.status == "filled":
+            if order_status.status in FINAL_ORDER_STATUSES:
                 for trade in self.trades:
                     if trade.entry_id == order_id:
-                        trade.entry_price = order_status.avg_price
-                        trade.quantity = order_status.executed_qty
+                        if order_status.executed_qty > 0:
+                            trade.entry_price = order_status.avg_price
+                            trade.quantity = order_status.executed_qty
+                            self._triggers.add(trade, self.take_profit, self.stop_loss)
+                        else:
+                            trade.status = "canceled"
+                            trade.quantity = 0
+                            self.ongoing_position = False
+                            self._add_log(f"Entry order on {self.contract.symbol} {self.tf} {order_status.status} "
+                                          f"without any fill, no position opened", "WARNING")
+
+                        self.client.journal.record_trade(trade)
+                        self.client.mark_trade_dirty(trade)
                         break
                 return
 
-        t = Timer(2.0, lambda: self._check_order_status(order_id))
-        t.start()
+        self.client.scheduler.call_later(2.0, lambda: self._check_order_status(order_id),
+                                         key=("order_status", order_id))
 
     def _open_position(self, signal_result: int):
 
@@ -154,6 +255,8 @@ class Strategy:
         :return:
         """
 
+        SIGNALS.labels(self.strat_name, "long" if signal_result == 1 else "short").inc()
+
         # Short is not allowed on Spot platforms
         if self.client.platform == "crypto_com" and signal_result == -1:
             return
@@ -179,63 +282,137 @@ class Strategy:
             if order_status.status == "filled":
                 avg_fill_price = order_status.avg_price
             else:
-                t = Timer(2.0, lambda: self._check_order_status(order_status.order_id))
-                t.start()
+                order_id = order_status.order_id
+                self.client.scheduler.call_later(2.0, lambda: self._check_order_status(order_id),
+                                                 key=("order_status", order_id))
 
             new_trade = Trade({"time": int(time.time() * 1000), "entry_price": avg_fill_price,
                                "contract": self.contract, "strategy": self.strat_name, "side": position_side,
-                               "status": "open", "pnl": 0, "quantity": order_status.executed_qty, "entry_id": order_status.order_id})
+                               "status": "open", "pnl": 0, "quantity": order_status.executed_qty, "entry_id": order_status.order_id,
+                               "strategy_id": self.strategy_id})
             self.trades.append(new_trade)
 
-    def _check_tp_sl(self, trade: Trade):
+            if avg_fill_price is not None:
+                self._triggers.add(new_trade, self.take_profit, self.stop_loss)
+
+            self.client.journal.record_trade(new_trade)
+            self.client.mark_trade_dirty(new_trade)
+
+    def restore_trades(self, trades: List[Trade]):
+
+        """
+        Resume the trades that were still open when the program was last closed, loaded from the trade journal.
+        :param trades:
+        :return:
+        """
+
+        for trade in trades:
+            self.trades.append(trade)
+            self.client.mark_trade_dirty(trade)
+            self.ongoing_position = True
+
+            if trade.entry_price is not None:
+                self._triggers.add(trade, self.take_profit, self.stop_loss)
+            else:
+                entry_id = trade.entry_id
+                self.client.scheduler.call_later(2.0, lambda: self._check_order_status(entry_id),
+                                                 key=("order_status", entry_id))
+
+        if len(trades) > 0:
+            self._add_log(f"{len(trades)} open trade(s) restored on {self.contract.symbol} {self.tf}")
+
+    def _check_tp_sl_batch(self, prices: List[float]):
+
+        """
+        Check the take profit and stop loss of the open trades against a batch of trade prices.
+        Only the lowest and highest prices of the batch are compared to the nearest triggers. When one of them was
+        crossed, the prices are replayed in order so that the exit is triggered at the same price as with
+        parse_trades().
+        :param prices: Trade prices, ordered by timestamp
+        :return:
+        """
+
+        if not self._triggers.is_crossed(min(prices), max(prices)):
+            return
+
+        for price in prices:
+            self._check_tp_sl(price)
+
+    def _check_tp_sl(self, price: Optional[float] = None):
+
+        """
+        Calculates whether the stop loss or take profit of an open trade has been reached, using the trigger prices
+        precomputed from the average entry price of each trade.
+        :param price: The price to compare to the triggers, the close of the current candlestick by default
+        :return:
+        """
+
+        if price is None:
+            price = self.candles[-1].close
+
+        for trade, kind in self._triggers.crossed(price):
+            self._close_position(trade, price, kind == "sl")
+
+    def _close_position(self, trade: Trade, price: float, sl_triggered: bool):
 
         """
-        Based on the average entry price, calculates whether the defined stop loss or take profit has been reached.
+        Place the exit order of a trade whose take profit or stop loss has been reached.
         :param trade:
+        :param price: The price that triggered the exit
+        :param sl_triggered: True for a stop loss, False for a take profit
         :return:
         """
 
-        tp_triggered = False
-        sl_triggered = False
+        self._add_log(f"{'Stop loss' if sl_triggered else 'Take profit'} for {self.contract.symbol} {self.tf} "
+                      f"| Current Price = {price} (Entry price was {trade.entry_price})")
 
-        price = self.candles[-1].close
+        order_side = "SELL" if trade.side == "long" else "BUY"
 
-        if trade.side == "long":
-            if self.stop_loss is not None:
-                if price <= trade.entry_price * (1 - self.stop_loss / 100):
-                    sl_triggered = True
-            if self.take_profit is not None:
-                if price >= trade.entry_price * (1 + self.take_profit / 100):
-                    tp_triggered = True
+        if not self.client.cryptocom:
+            # Make sure we don't sell more than what's in the available balance on Binance Spot
+            current_balances = self.client.get_balances()
+            if current_balances is not None:
+                if order_side == "SELL" and self.contract.base_asset in current_balances:
+                    trade.quantity = min(current_balances[self.contract.base_asset].free, trade.quantity)
 
-        elif trade.side == "short":
-            if self.stop_loss is not None:
-                if price >= trade.entry_price * (1 + self.stop_loss / 100):
-                    sl_triggered = True
-            if self.take_profit is not None:
-                if price <= trade.entry_price * (1 - self.take_profit / 100):
-                    tp_triggered = True
+        order_status = self.client.place_order(self.contract, "MARKET", trade.quantity, order_side)
 
-        if tp_triggered or sl_triggered:
+        if order_status is not None:
+            self._add_log(f"Exit order on {self.contract.symbol} {self.tf} placed successfully")
+
+            trade.exit_price = order_status.avg_price if order_status.status == "filled" else price
+            trade.close_time = int(time.time() * 1000)
+
+            if trade.side == "long":
+                trade.pnl = (trade.exit_price - trade.entry_price) * trade.quantity
+            else:
+                trade.pnl = (trade.entry_price - trade.exit_price) * trade.quantity
+
+            trade.status = "closed"
+            self.ongoing_position = False
+            self._triggers.remove(trade)
+
+            self.client.journal.record_trade(trade)
+            self.client.analytics.on_trade_closed(trade)
+            self.client.mark_trade_dirty(trade)
 
-            self._add_log(f"{'Stop loss' if sl_triggered else 'Take profit'} for {self.contract.symbol} {self.tf} "
-                          f"| Current Price = {price} (Entry price was {trade.entry_price})")
+            self._trim_closed_trades()
 
-            order_side = "SELL" if trade.side == "long" else "BUY"
+    def _trim_closed_trades(self):
 
-            if not self.client.futures:
-                # Make sure we don't sell more than what's in the available balance on Binance Spot
-                current_balances = self.client.get_balances()
-                if current_balances is not None:
-                    if order_side == "SELL" and self.contract.base_asset in current_balances:
-                        trade.quantity = min(current_balances[self.contract.base_asset].free, trade.quantity)
+        """
+        Forget the oldest closed (or canceled) trades beyond the retention limit, they are already queued to the trade
+        journal.
+        The list is replaced rather than modified so that the threads iterating over it aren't disturbed.
+        :return:
+        """
 
-            order_status = self.client.place_order(self.contract, "MARKET", trade.quantity, order_side)
+        closed = [trade for trade in self.trades if trade.status != "open"]
+        excess = len(closed) - self.client.retention['closed_trades']
 
-            if order_status is not None:
-                self._add_log(f"Exit order on {self.contract.symbol} {self.tf} placed successfully")
-                trade.status = "closed"
-                self.ongoing_position = False
+        if excess > 0:
+            dropped = set(id(trade) for trade in closed[:excess])
+            self.trades = [trade for trade in self.trades if id(trade) not in dropped]
 
 
 class TechnicalStrategy(Strategy):
@@ -249,6 +426,9 @@ class TechnicalStrategy(Strategy):
 
         self._rsi_length = other_params['rsi_length']
 
+        # The EMAs need a few times their length of history to converge
+        self.min_candles = 4 * max(self._ema_slow + self._ema_signal, self._rsi_length)
+
     def _rsi(self) -> float:
 
         """
@@ -256,6 +436,8 @@ class TechnicalStrategy(Strategy):
         :return: The RSI value of the previous candlestick
         """
 
+        import pandas as pd  # Imported on first use, only the Technical strategy needs it
+
         close_list = []
         for candle in self.candles:
             close_list.append(candle.close)
@@ -286,6 +468,8 @@ class TechnicalStrategy(Strategy):
         :return: The MACD and the MACD Signal value of the previous candlestick
         """
 
+        import pandas as pd
+
         close_list = []
         for candle in self.candles:
             close_list.append(candle.close)  # Use only the close price of each candlestick for the calculations
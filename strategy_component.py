@@ -2,13 +2,13 @@ import tkinter as tk
 import typing
 
 import json
+import uuid
 
 from styling import *
 from scrollable_frame import ScrollableFrame
 
 from CryptoCom import CryptoComClient
 
-from strategies import TechnicalStrategy, BreakoutStrategy
 from utils import *
 
 from database import WorkspaceData
@@ -56,6 +56,8 @@ class StrategyEditor(tk.Frame):
         self.additional_parameters = dict()
         self._extra_input = dict()
 
+        self.row_keys: typing.Dict[int, str] = dict()  # Identifies each row in the database from one save to the next
+
         # Defines the widgets displayed on each row and some characteristics of these widgets like their width
         # This lets the program create the widgets dynamically and it takes less space in the code
         # The width may need to be adjusted depending on your screen size and resolution
@@ -156,6 +158,7 @@ class StrategyEditor(tk.Frame):
             self.body_widgets[code_name][b_index].grid(row=b_index, column=col, padx=2)
 
         self.additional_parameters[b_index] = dict()
+        self.row_keys[b_index] = uuid.uuid4().hex[:16]
 
         for strat, params in self.extra_params.items():
             for param in params:
@@ -286,30 +289,17 @@ class StrategyEditor(tk.Frame):
 
         if self.body_widgets['activation'][b_index].cget("text") == "OFF":
 
-            if strat_selected == "Technical":
-                new_strategy = TechnicalStrategy(self._exchanges[exchange], contract, exchange, timeframe, balance_pct,
-                                                 take_profit, stop_loss, self.additional_parameters[b_index])
-            elif strat_selected == "Breakout":
-                new_strategy = BreakoutStrategy(self._exchanges[exchange], contract, exchange, timeframe, balance_pct,
-                                                take_profit, stop_loss, self.additional_parameters[b_index])
-            else:
-                return
-
-            # Collects historical data. It is just one API call so that is ok, but be careful not to call methods
-            # that would lock the UI for too long.
+            # Collects historical data from the local candle store, which only requests the candles missing since
+            # the last time. Be careful not to call methods that would lock the UI for too long.
             # For example don't make a query to a database containing billions of rows, your interface would freeze.
-            new_strategy.candles = self._exchanges[exchange].get_historical_candles(contract, timeframe)
+            new_strategy = self._exchanges[exchange].start_strategy(b_index, strat_selected, contract, timeframe,
+                                                                    balance_pct, take_profit, stop_loss,
+                                                                    self.additional_parameters[b_index],
+                                                                    strategy_id=self.row_keys[b_index])
 
-            if len(new_strategy.candles) == 0:
-                self.root.logging_frame.add_log(f"No historical data retrieved for {contract.symbol}")
+            if new_strategy is None:  # The reason is displayed through the logs of the connector
                 return
 
-            if exchange == "CryptoCom":
-                self._exchanges[exchange].subscribe_channel([contract], "aggTrade")
-                self._exchanges[exchange].subscribe_channel([contract], "bookTicker")
-
-            self._exchanges[exchange].strategies[b_index] = new_strategy
-
             for param in self._base_params:
                 code_name = param['code_name']
 
@@ -320,7 +310,7 @@ class StrategyEditor(tk.Frame):
             self.root.logging_frame.add_log(f"{strat_selected} strategy on {symbol} / {timeframe} started")
 
         else:
-            del self._exchanges[exchange].strategies[b_index]
+            self._exchanges[exchange].stop_strategy(b_index)
 
             for param in self._base_params:
                 code_name = param['code_name']
@@ -345,6 +335,8 @@ class StrategyEditor(tk.Frame):
 
             b_index = self._body_index - 1  # -1 to select the row that was just added
 
+            self.row_keys[b_index] = row['row_key']
+
             for base_param in self._base_params:
                 code_name = base_param['code_name']
 
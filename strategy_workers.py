@@ -0,0 +1,247 @@
+import collections
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import typing
+
+from models import *
+from market_bus import MarketDataBus
+from strategies import TechnicalStrategy, BreakoutStrategy
+
+if typing.TYPE_CHECKING:
+    from CryptoCom import CryptoComClient
+
+
+logger = logging.getLogger()
+
+
+class StrategyWorkers:
+    def __init__(self, client: "CryptoComClient", processes: int, capacity: int = 65536, poll_interval: float = 0.005):
+
+        """
+        Runs the signal computation of the Technical strategies in separate processes, so that the pandas indicators
+        use other cores than the websocket thread and don't hold its GIL.
+        The connector publishes the public trades in a shared memory MarketDataBus, each worker builds the candles of
+        its strategies from it and sends their signals back. Orders are only placed by this process, from a single
+        gateway thread, with the same risk checks, trades and take profit / stop loss tracking as the other strategies.
+        :param client:
+        :param processes: Number of worker processes, the strategies are spread across them
+        :param capacity: Trades kept in the bus, a worker that falls further behind loses some
+        :param poll_interval: Seconds a worker waits when the bus has nothing new
+        """
+
+        self._client = client
+        self._bus = MarketDataBus(capacity)
+
+        self._instrument_ids: typing.Dict[str, int] = dict()  # Only the instruments of the remote strategies
+        self._assignments: typing.Dict[typing.Hashable, int] = dict()  # Strategy key -> worker index
+
+        context = multiprocessing.get_context("spawn")  # Forking a process that runs threads isn't safe
+        self._results = context.Queue()
+
+        self._workers: typing.List[typing.Tuple[multiprocessing.Process, multiprocessing.Queue]] = []
+
+        for i in range(processes):
+            commands = context.Queue()
+            process = context.Process(target=_worker_main, args=(self._bus.name, commands, self._results,
+                                                                 client.retention, poll_interval),
+                                      name=f"strategy_worker_{i}", daemon=True)
+            process.start()
+            self._workers.append((process, commands))
+
+        self._gateway = threading.Thread(target=self._run_gateway, name="order_gateway", daemon=True)
+        self._gateway.start()
+
+        logger.info("%s strategy worker processes started", processes)
+
+    def add(self, key: typing.Hashable, strategy_type: str, contract: Contract, timeframe: str,
+            balance_pct: float, take_profit: float, stop_loss: float, extra_params: typing.Dict,
+            candles: typing.List[Candle]):
+
+        """
+        Start computing the signals of a strategy in the least loaded worker.
+        The worker gets a copy of the historical candles and continues them with the trades published from now on.
+        :return:
+        """
+
+        if contract.symbol not in self._instrument_ids:
+            self._instrument_ids[contract.symbol] = len(self._instrument_ids)
+
+        loads = [list(self._assignments.values()).count(i) for i in range(len(self._workers))]
+        worker = loads.index(min(loads))
+
+        self._assignments[key] = worker
+        self._workers[worker][1].put(("add", key, strategy_type, contract, timeframe, balance_pct, take_profit,
+                                      stop_loss, extra_params, candles, self._instrument_ids[contract.symbol],
+                                      self._bus.sequence))
+
+    def remove(self, key: typing.Hashable):
+        worker = self._assignments.pop(key, None)
+
+        if worker is not None:
+            self._workers[worker][1].put(("remove", key))
+
+    def publish(self, symbol: str, trades: typing.List[typing.Tuple[float, float, int]]):
+
+        """
+        Called by the websocket thread for every batch of public trades. Nothing is written for the instruments
+        that no remote strategy trades.
+        :param symbol:
+        :param trades: (price, size, timestamp) tuples
+        :return:
+        """
+
+        instrument_id = self._instrument_ids.get(symbol)
+
+        if instrument_id is not None:
+            self._bus.publish(instrument_id, trades)
+
+    def stop(self):
+        for process, commands in self._workers:
+            commands.put(("stop",))
+
+        for process, commands in self._workers:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+
+        self._results.put(None)  # Ends the gateway thread
+        self._gateway.join(timeout=2)
+
+        self._bus.close()
+        self._bus.unlink()
+
+    def _run_gateway(self):
+
+        """
+        Single entry point of the orders of the remote strategies: acts on the signals sent by the workers with the
+        strategy objects of this process.
+        :return:
+        """
+
+        while True:
+            message = self._results.get()
+
+            if message is None:
+                break
+
+            kind, key = message[0], message[1]
+            strategy = self._client.strategies.get(key)
+
+            if strategy is None:  # Stopped in the meantime
+                continue
+
+            try:
+                if kind == "signal":
+                    if not strategy.ongoing_position:
+                        strategy._open_position(message[2])
+                elif kind == "lost":
+                    strategy._add_log(f"{message[2]} trades missed by the worker computing the signals", "WARNING")
+                elif kind == "error":
+                    strategy._add_log(f"Signal computation failed: {message[2]}", "ERROR")
+            except Exception as e:
+                logger.error("Order gateway error for strategy %s: %s", key, e)
+
+
+class _WorkerClient:
+
+    """
+    What the strategies use of the connector when they only build candles and compute signals in a worker.
+    """
+
+    def __init__(self, retention: typing.Dict[str, int]):
+        self.retention = retention
+        self.log_queue = collections.deque(maxlen=0)  # Not displayed, the orders are logged by the gateway
+        self.updates = self
+
+    def notify(self, topic: str, key: typing.Optional[typing.Hashable] = None):
+        pass
+
+
+def _worker_main(bus_name: str, commands: multiprocessing.Queue, results: multiprocessing.Queue,
+                 retention: typing.Dict[str, int], poll_interval: float):
+
+    """
+    Entry point of a worker process: read the trades from the bus, update the candles of the strategies of their
+    instrument, and send a signal when a new candle gives one.
+    """
+
+    bus = MarketDataBus(name=bus_name)
+    client = _WorkerClient(retention)
+
+    # Strategy key -> (strategy, instrument id, sequence of the first trade published after it was added)
+    strategies: typing.Dict[typing.Hashable, typing.Tuple[typing.Any, int, int]] = dict()
+
+    cursor = bus.sequence
+    running = True
+
+    while running:
+        try:
+            while True:
+                command = commands.get_nowait()
+
+                if command[0] == "add":
+                    (key, strategy_type, contract, timeframe, balance_pct, take_profit, stop_loss, extra_params,
+                     candles, instrument_id, start_seq) = command[1:]
+
+                    strategy_class = TechnicalStrategy if strategy_type == "Technical" else BreakoutStrategy
+                    strategy = strategy_class(client, contract, "CryptoCom", timeframe, balance_pct, take_profit,
+                                              stop_loss, extra_params)
+                    strategy.candles = candles
+
+                    strategies[key] = (strategy, instrument_id, start_seq)
+
+                    if start_seq < cursor:  # Trades published before the worker got the command
+                        backlog, end, lost = bus.read(start_seq, cursor - start_seq)
+                        _feed(key, strategy, instrument_id, start_seq, backlog, end - len(backlog), results)
+                elif command[0] == "remove":
+                    strategies.pop(command[1], None)
+                elif command[0] == "stop":
+                    running = False
+                    break
+        except queue.Empty:
+            pass
+
+        records, new_cursor, lost = bus.read(cursor)
+
+        if len(records) == 0:
+            time.sleep(poll_interval)
+            continue
+
+        for key, (strategy, instrument_id, start_seq) in list(strategies.items()):
+            if lost > 0:
+                results.put(("lost", key, lost))
+
+            _feed(key, strategy, instrument_id, start_seq, records, new_cursor - len(records), results)
+
+        cursor = new_cursor
+
+    bus.close()
+
+
+def _feed(key: typing.Hashable, strategy, instrument_id: int, start_seq: int,
+          records: typing.List[typing.Tuple[int, int, float, float]], first_seq: int, results: multiprocessing.Queue):
+
+    """
+    Update the candles of a worker strategy with the records of its instrument, and send its signal if a new candle
+    gives one.
+    :param first_seq: Sequence of the first record
+    :return:
+    """
+
+    trades = [(price, size, timestamp) for seq, (record_id, timestamp, price, size) in enumerate(records, first_seq)
+              if record_id == instrument_id and seq >= start_seq]
+
+    if len(trades) == 0:
+        return
+
+    try:
+        if strategy.parse_trades_batch(trades) == "new_candle":
+            signal_result = strategy._check_signal()
+
+            if signal_result in [1, -1]:
+                results.put(("signal", key, signal_result))
+    except Exception as e:
+        results.put(("error", key, str(e)))
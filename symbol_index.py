@@ -0,0 +1,89 @@
+import bisect
+import typing
+
+from models import *
+
+
+class SymbolIndex:
+    def __init__(self, contracts: typing.Dict[str, Contract]):
+
+        """
+        Search index of the instrument names, built once when the contracts are loaded.
+        Symbols and assets are kept in sorted arrays: all the names starting with a prefix are then a contiguous range
+        found by bisection, so a lookup only reads the first results instead of every instrument.
+        Substring matches are searched in a single string holding all the symbols, one per line.
+        """
+
+        self._symbols: typing.List[str] = sorted(contracts.keys())
+
+        # Asset (base and quote) -> symbols trading it, e.g. BTC -> [BTC_USD, BTC_USDT, ETH_BTC]
+        symbols_by_asset: typing.Dict[str, typing.List[str]] = dict()
+        for symbol, contract in contracts.items():
+            for asset in (contract.base_asset, contract.quote_asset):
+                symbols_by_asset.setdefault(asset.upper(), []).append(symbol)
+
+        self._assets: typing.List[str] = sorted(symbols_by_asset.keys())
+        self._symbols_by_asset = {asset: sorted(symbols) for asset, symbols in symbols_by_asset.items()}
+
+        self._text = "\n".join(self._symbols)
+        self._line_starts: typing.List[int] = []  # Position of each symbol in self._text
+        position = 0
+        for symbol in self._symbols:
+            self._line_starts.append(position)
+            position += len(symbol) + 1
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        index = bisect.bisect_left(self._symbols, symbol)
+        return index < len(self._symbols) and self._symbols[index] == symbol
+
+    def search(self, text: str, limit: int = 8, assets: bool = True, substrings: bool = True) -> typing.List[str]:
+
+        """
+        Find up to limit symbols matching the typed text, best matches first:
+        1. Symbols starting with the text, alphabetically
+        2. Symbols trading an asset starting with the text (e.g. "ETH" -> "USDC_ETH"), if assets is True
+        3. Symbols containing the text anywhere, if substrings is True
+        :param text: Typed text, already in uppercase
+        :param limit: Maximum number of symbols returned
+        :param assets: Also match on the base and quote assets
+        :param substrings: Also match the text in the middle of the symbol
+        :return:
+        """
+
+        matched = self._prefix_range(self._symbols, text, limit)
+
+        if len(matched) < limit and assets:
+            for asset in self._prefix_range(self._assets, text, limit):
+                for symbol in self._symbols_by_asset[asset]:
+                    if symbol not in matched:
+                        matched.append(symbol)
+                        if len(matched) == limit:
+                            return matched
+
+        if len(matched) < limit and substrings and text != "":
+            position = self._text.find(text)
+
+            while position != -1 and len(matched) < limit:
+                index = bisect.bisect_right(self._line_starts, position) - 1
+                symbol = self._symbols[index]
+                if symbol not in matched:
+                    matched.append(symbol)
+                position = self._text.find(text, self._line_starts[index] + len(symbol) + 1)  # From the next symbol
+
+        return matched
+
+    @staticmethod
+    def _prefix_range(names: typing.List[str], prefix: str, limit: int) -> typing.List[str]:
+        start = bisect.bisect_left(names, prefix)
+        end = min(start + limit, len(names))
+
+        matched = []
+        for name in names[start:end]:
+            if not name.startswith(prefix):
+                break  # Sorted array, the following names can't start with the prefix either
+            matched.append(name)
+
+        return matched
@@ -0,0 +1,82 @@
+"""
+Entry orders of a strategy that the paper trading engine doesn't fill completely.
+Run from the repository root: python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Contract
+from paper_trading import PaperTradingClient
+from strategies import BreakoutStrategy
+from benchmarks import fixtures
+
+
+SYMBOL = "BTC_USDT"
+
+
+def book(timestamp: int, bid: float, ask: float, size: float) -> str:
+    msg = {"e": "bookTicker", "s": SYMBOL, "b": str(bid), "a": str(ask), "B": str(size), "A": str(size)}
+    return f"{timestamp}\t{json.dumps(msg)}"
+
+
+class EntryOrderStatusTest(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._directory = tempfile.TemporaryDirectory()
+        os.chdir(self._directory.name)  # The journal is created in the current directory
+
+        self.contract = Contract({"instrument_name": SYMBOL, "base_currency": "BTC", "quote_currency": "USDT",
+                                  "quote_decimals": 2, "quantity_decimals": 4, "price_tick_size": 2,
+                                  "qty_tick_size": 4}, "crypto_com")
+
+        # Levels beyond the best ask of 0.001 BTC: a 1 BTC market order can't be filled within 20 levels
+        self.client = PaperTradingClient(settings={"touch_size_quote": 30.0, "balances": {"USDT": 100000.0}},
+                                         contracts={SYMBOL: self.contract}, live=False)
+
+        self.strategy = BreakoutStrategy(self.client, self.contract, "CryptoCom", "1m", 30.0, 1.0, 1.0,
+                                         {"min_volume": 0.0})
+        self.strategy.candles = fixtures.candles(10, 0)
+
+    def tearDown(self):
+        self.client.scheduler.stop()
+        self.client.journal.stop()
+
+        os.chdir(self._cwd)
+        self._directory.cleanup()
+
+    def test_partially_filled_market_order_opens_the_trade(self):
+        self.client.replay([book(1000, 30000.0, 30001.0, 0.01)])
+        self.strategy._open_position(1)
+
+        trade = self.strategy.trades[0]
+        self.client.replay([book(2000, 30000.0, 30001.0, 0.01)])  # The order reaches the book
+        self.strategy._check_order_status(trade.entry_id)
+
+        self.assertEqual(self.client.engine.orders[trade.entry_id].status, "canceled")
+        self.assertEqual(trade.status, "open")
+        self.assertIsNotNone(trade.entry_price)
+        self.assertAlmostEqual(trade.quantity, self.client.engine.orders[trade.entry_id].filled)
+        self.assertGreater(trade.quantity, 0)
+        self.assertTrue(self.strategy.ongoing_position)
+
+    def test_rejected_market_order_cancels_the_trade(self):
+        self.strategy._open_position(1)  # No book yet for the instrument: the order is rejected when it arrives
+
+        trade = self.strategy.trades[0]
+        self.client.replay([book(int(1e15), 30000.0, 30001.0, 0.01)])
+        self.strategy._check_order_status(trade.entry_id)
+
+        self.assertEqual(self.client.engine.orders[trade.entry_id].status, "rejected")
+        self.assertEqual(trade.status, "canceled")
+        self.assertIsNone(trade.entry_price)
+        self.assertFalse(self.strategy.ongoing_position)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,19 @@
 import tkinter as tk
 import typing
+import collections
 import datetime
 
 from models import *
 
 from styling import *
-from scrollable_frame import ScrollableFrame
+from virtual_table import VirtualTable
 
 
 class TradesWatch(tk.Frame):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_closed_rows: int = 200, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.body_widgets = dict()  # Dictionary of dictionaries, contains all the references to the widgets in the table
+        self._max_closed_rows = max_closed_rows
 
         self._headers = ["time", "symbol", "exchange", "strategy", "side", "quantity", "status", "pnl"]
 
@@ -34,15 +35,14 @@ class TradesWatch(tk.Frame):
 
         self._headers_frame.pack(side=tk.TOP, anchor="nw")
 
-        self._body_frame = ScrollableFrame(self, bg=BG_COLOR, height=250)
-        self._body_frame.pack(side=tk.TOP, anchor="nw", fill=tk.X)
+        # Only the visible rows have widgets, the trades themselves are kept in the table data model
 
-        for h in self._headers:
-            self.body_widgets[h] = dict()
-            if h in ["status", "pnl", "quantity"]:
-                self.body_widgets[h + "_var"] = dict()
+        self._table = VirtualTable([{"code_name": h, "widget": "label", "width": self._col_width}
+                                    for h in self._headers], 10, self, bg=BG_COLOR)
+        self._table.pack(side=tk.TOP, anchor="nw", fill=tk.X)
 
-        self._body_index = 0
+        self._versions: typing.Dict[str, int] = dict()  # Version of each trade when its row was last updated
+        self._closed_rows: typing.Deque[str] = collections.deque()  # Closed trades rows, oldest first
 
     def add_trade(self, trade: Trade):
 
@@ -52,77 +52,43 @@ class TradesWatch(tk.Frame):
         :return:
         """
 
-        b_index = self._body_index
-
-        t_index = trade.time  # This is the trade row identifier, Unix Timestamp in milliseconds, so should be unique.
-
         dt_str = datetime.datetime.fromtimestamp(trade.time / 1000).strftime("%b %d %H:%M")
 
-        self.body_widgets['time'][t_index] = tk.Label(self._body_frame.sub_frame, text=dt_str, bg=BG_COLOR,
-                                                      fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['time'][t_index].grid(row=b_index, column=0)
-
-        # Symbol
-
-        self.body_widgets['symbol'][t_index] = tk.Label(self._body_frame.sub_frame, text=trade.contract.symbol,
-                                                        bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT,
-                                                        width=self._col_width)
-        self.body_widgets['symbol'][t_index].grid(row=b_index, column=1)
-
-        # Exchange
-
-        self.body_widgets['exchange'][t_index] = tk.Label(self._body_frame.sub_frame,
-                                                          text=trade.contract.exchange.capitalize(),
-                                                          bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT,
-                                                          width=self._col_width)
-        self.body_widgets['exchange'][t_index].grid(row=b_index, column=2)
-
-        # Strategy
-
-        self.body_widgets['strategy'][t_index] = tk.Label(self._body_frame.sub_frame, text=trade.strategy, bg=BG_COLOR,
-                                                        fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['strategy'][t_index].grid(row=b_index, column=3)
-
-        # Side
-
-        self.body_widgets['side'][t_index] = tk.Label(self._body_frame.sub_frame, text=trade.side.capitalize(),
-                                                      bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['side'][t_index].grid(row=b_index, column=4)
-
-        # Quantity
-
-        self.body_widgets['quantity_var'][t_index] = tk.StringVar()  # Variable because the order is not always filled immediately
-        self.body_widgets['quantity'][t_index] = tk.Label(self._body_frame.sub_frame,
-                                                          textvariable=self.body_widgets['quantity_var'][t_index],
-                                                          bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['quantity'][t_index].grid(row=b_index, column=5)
-
-        # Status
-
-        self.body_widgets['status_var'][t_index] = tk.StringVar()
-        self.body_widgets['status'][t_index] = tk.Label(self._body_frame.sub_frame,
-                                                        textvariable=self.body_widgets['status_var'][t_index],
-                                                        bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['status'][t_index].grid(row=b_index, column=6)
-
-        # PNL
-
-        self.body_widgets['pnl_var'][t_index] = tk.StringVar()
-        self.body_widgets['pnl'][t_index] = tk.Label(self._body_frame.sub_frame,
-                                                     textvariable=self.body_widgets['pnl_var'][t_index], bg=BG_COLOR,
-                                                     fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['pnl'][t_index].grid(row=b_index, column=7)
-
-        self._body_index += 1
-
-
-
+        # The trade id is the row identifier, stable for the whole life of the trade
 
+        self._table.insert(trade.id, {"time": dt_str, "symbol": trade.contract.symbol,
+                                      "exchange": trade.contract.exchange.capitalize(), "strategy": trade.strategy,
+                                      "side": trade.side.capitalize()})
 
+    def update_trade(self, trade: Trade):
 
+        """
+        Add the row of a new trade or refresh the quantity, status and PNL of an existing one.
+        Rows are only touched when the trade version changed since the last update.
+        :param trade:
+        :return:
+        """
 
+        if trade.id not in self._versions:
+            self.add_trade(trade)
+        elif self._versions[trade.id] == trade.version:
+            return
 
+        self._versions[trade.id] = trade.version
 
+        if "CryptoCom" in trade.contract.exchange:
+            precision = trade.contract.price_decimals
+        else:
+            precision = 8  # The CryptoCom PNL is always is BTC, thus 8 decimals
 
+        pnl_str = "{0:.{prec}f}".format(trade.pnl, prec=precision)
+        self._table.update(trade.id, {"quantity": str(trade.quantity), "status": trade.status.capitalize(),
+                                      "pnl": pnl_str})
 
+        if trade.status == "closed" and trade.id not in self._closed_rows:
+            self._closed_rows.append(trade.id)
 
+            while len(self._closed_rows) > self._max_closed_rows:
+                old_id = self._closed_rows.popleft()
+                self._table.remove(old_id)
+                del self._versions[old_id]
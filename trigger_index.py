@@ -0,0 +1,117 @@
+import bisect
+import itertools
+import math
+import typing
+
+from models import *
+
+
+class TriggerIndex:
+    def __init__(self):
+
+        """
+        Take profit and stop loss trigger prices of the open trades of one instrument, precomputed when the entry price
+        is known and kept in two sorted arrays:
+        - Upside triggers fire when the price rises to them (take profit of a Long, stop loss of a Short)
+        - Downside triggers fire when the price falls to them (stop loss of a Long, take profit of a Short)
+        Checking a price is then a comparison with the nearest trigger of each array.
+        """
+
+        self._upside: typing.List[typing.Tuple[float, int]] = []  # (trigger price, sequence number), ascending
+        self._downside: typing.List[typing.Tuple[float, int]] = []
+
+        self._entries: typing.Dict[int, typing.Tuple[Trade, str]] = dict()  # Sequence number -> (trade, "tp" or "sl")
+        self._trade_keys: typing.Dict[int, typing.List[typing.Tuple[str, float, int]]] = dict()  # id(trade) -> keys
+
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._trade_keys)
+
+    def add(self, trade: Trade, take_profit: typing.Optional[float], stop_loss: typing.Optional[float]):
+
+        """
+        Register the trigger prices of a trade whose average entry price is known.
+        :param trade:
+        :param take_profit: Take profit in percentage of the entry price, None if not used
+        :param stop_loss: Stop loss in percentage of the entry price, None if not used
+        :return:
+        """
+
+        self.remove(trade)
+
+        triggers = []
+
+        if trade.side == "long":
+            if take_profit is not None:
+                triggers.append(("up", trade.entry_price * (1 + take_profit / 100), "tp"))
+            if stop_loss is not None:
+                triggers.append(("down", trade.entry_price * (1 - stop_loss / 100), "sl"))
+
+        elif trade.side == "short":
+            if stop_loss is not None:
+                triggers.append(("up", trade.entry_price * (1 + stop_loss / 100), "sl"))
+            if take_profit is not None:
+                triggers.append(("down", trade.entry_price * (1 - take_profit / 100), "tp"))
+
+        keys = []
+
+        for direction, price, kind in triggers:
+            seq = next(self._seq)
+            bisect.insort(self._upside if direction == "up" else self._downside, (price, seq))
+            self._entries[seq] = (trade, kind)
+            keys.append((direction, price, seq))
+
+        if len(keys) > 0:
+            self._trade_keys[id(trade)] = keys
+
+    def remove(self, trade: Trade):
+
+        """
+        Unregister the trigger prices of a trade, typically once it is closed.
+        :param trade:
+        :return:
+        """
+
+        for direction, price, seq in self._trade_keys.pop(id(trade), []):
+            triggers = self._upside if direction == "up" else self._downside
+            i = bisect.bisect_left(triggers, (price, seq))
+            del triggers[i]
+            del self._entries[seq]
+
+    def is_crossed(self, low: float, high: float) -> bool:
+
+        """
+        Constant time check of whether any trigger lies within the price range.
+        :param low: Lowest price since the last check
+        :param high: Highest price since the last check
+        :return:
+        """
+
+        return (len(self._upside) > 0 and high >= self._upside[0][0]) or \
+               (len(self._downside) > 0 and low <= self._downside[-1][0])
+
+    def crossed(self, price: float) -> typing.List[typing.Tuple[Trade, str]]:
+
+        """
+        Get the triggers crossed by a price. They stay registered until remove() is called for their trade.
+        :param price:
+        :return: A list of (trade, "tp" or "sl"), with one element per trade
+        """
+
+        if not self.is_crossed(price, price):
+            return []
+
+        up_end = bisect.bisect_right(self._upside, (price, math.inf))
+        down_start = bisect.bisect_left(self._downside, (price, -math.inf))
+
+        result = []
+        seen = set()
+
+        for price_seq in itertools.chain(self._upside[:up_end], self._downside[down_start:]):
+            trade, kind = self._entries[price_seq[1]]
+            if id(trade) not in seen:
+                seen.add(id(trade))
+                result.append((trade, kind))
+
+        return result
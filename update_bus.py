@@ -0,0 +1,51 @@
+import threading
+import typing
+
+
+class UpdateBus:
+    def __init__(self):
+
+        """
+        Change notifications from the connector and its strategies (websocket and scheduler threads) to the interface.
+        Producers notify a topic ("prices", "trades", "logs"), optionally with the key of what changed (a symbol...).
+        Notifications are coalesced: the interface collects the set of keys changed since its last refresh of the topic,
+        however many times they changed in between.
+        """
+
+        self._lock = threading.Lock()
+        self._pending: typing.Dict[str, typing.Set[typing.Hashable]] = dict()  # Topic -> keys changed
+
+        # Metrics
+
+        self.notified = 0
+        self.collected = 0
+
+    def notify(self, topic: str, key: typing.Optional[typing.Hashable] = None):
+        with self._lock:
+            keys = self._pending.setdefault(topic, set())
+            if key is not None:
+                keys.add(key)
+            self.notified += 1
+
+    def pending(self) -> typing.Set[str]:
+
+        """
+        :return: The topics that changed since they were last collected
+        """
+
+        with self._lock:
+            return set(self._pending.keys())
+
+    def collect(self, topic: str) -> typing.Set[typing.Hashable]:
+
+        """
+        Take the keys changed since the last call for this topic.
+        :param topic:
+        :return: The changed keys, empty if the topic was notified without keys or not notified at all
+        """
+
+        with self._lock:
+            keys = self._pending.pop(topic, None)
+            if keys is not None:
+                self.collected += 1
+            return keys if keys is not None else set()
@@ -0,0 +1,190 @@
+import tkinter as tk
+import typing
+
+from styling import *
+
+
+class VirtualTable(tk.Frame):
+    def __init__(self, columns: typing.List[typing.Dict], visible_rows: int, *args, **kwargs):
+
+        """
+        Table whose rows are stored in a plain data model, only the visible rows having widgets.
+        A fixed pool of widget rows is created once and recycled when scrolling: each row of the pool displays the
+        model row at the current offset + its position.
+        Columns are dictionaries with the keys code_name, width, and widget ("label" or "button").
+        Button columns also have a text, a bg and a command called with the key of the row.
+        """
+
+        super().__init__(*args, **kwargs)
+
+        self._columns = columns
+        self._visible_rows = visible_rows
+
+        self._keys: typing.List[typing.Hashable] = []  # Row keys, in display order
+        self._rows: typing.Dict[typing.Hashable, typing.Dict[str, str]] = dict()  # Row key -> column -> text
+
+        self._offset = 0  # Index of the first visible row
+
+        self._body_frame = tk.Frame(self, bg=kwargs.get("bg", BG_COLOR))
+        self._body_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        self._vsb = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scroll)
+        self._vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._body_frame.bind("<Enter>", self._activate_mousewheel)
+        self._body_frame.bind("<Leave>", self._deactivate_mousewheel)
+
+        # Widget pool, the text displayed by each cell is cached to skip the Tk calls when it doesn't change
+
+        self._pool: typing.List[typing.Dict[str, tk.Widget]] = []
+        self._displayed: typing.List[typing.Dict[str, typing.Optional[str]]] = []
+
+        for row_nb in range(visible_rows):
+            widgets = dict()
+
+            for col, column in enumerate(columns):
+                if column['widget'] == "button":
+                    widget = tk.Button(self._body_frame, text=column['text'], bg=column['bg'], fg=FG_COLOR,
+                                       font=GLOBAL_FONT, width=column['width'],
+                                       command=lambda pool_row=row_nb, frozen_command=column['command']:
+                                       self._on_button(pool_row, frozen_command))
+                else:
+                    widget = tk.Label(self._body_frame, text="", bg=kwargs.get("bg", BG_COLOR), fg=FG_COLOR_2,
+                                      font=GLOBAL_FONT, width=column['width'])
+
+                widget.grid(row=row_nb, column=col)
+                widgets[column['code_name']] = widget
+
+            self._pool.append(widgets)
+            self._displayed.append({column['code_name']: None for column in columns})
+
+        self._render()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._rows
+
+    def keys(self) -> typing.List[typing.Hashable]:
+        return list(self._keys)
+
+    def get(self, key: typing.Hashable) -> typing.Dict[str, str]:
+        return self._rows[key]
+
+    def insert(self, key: typing.Hashable, values: typing.Dict[str, str]):
+
+        """
+        Add a row at the end of the table.
+        :param key: Unique identifier of the row
+        :param values: Text of each column, by code_name
+        :return:
+        """
+
+        self._keys.append(key)
+        self._rows[key] = dict(values)
+
+        if len(self._keys) - 1 < self._offset + self._visible_rows:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def update(self, key: typing.Hashable, values: typing.Dict[str, str]):
+
+        """
+        Change some columns of a row. Widgets are only touched if the row is visible.
+        :param key:
+        :param values: Text of the changed columns, by code_name
+        :return:
+        """
+
+        self._rows[key].update(values)
+
+        visible_keys = self._keys[self._offset:self._offset + self._visible_rows]
+
+        if key in visible_keys:
+            self._render_row(visible_keys.index(key))
+
+    def remove(self, key: typing.Hashable):
+        self._keys.remove(key)
+        del self._rows[key]
+
+        self._offset = max(0, min(self._offset, len(self._keys) - self._visible_rows))
+        self._render()
+
+    def _on_button(self, pool_row: int, command: typing.Callable):
+        index = self._offset + pool_row
+        if index < len(self._keys):
+            command(self._keys[index])
+
+    def _render(self):
+        for pool_row in range(self._visible_rows):
+            self._render_row(pool_row)
+
+        self._update_scrollbar()
+
+    def _render_row(self, pool_row: int):
+
+        """
+        Display the model row currently mapped to a row of the widget pool, or blank it past the end of the model.
+        :param pool_row:
+        :return:
+        """
+
+        index = self._offset + pool_row
+        row = self._rows[self._keys[index]] if index < len(self._keys) else None
+
+        widgets = self._pool[pool_row]
+        displayed = self._displayed[pool_row]
+
+        for column in self._columns:
+            code_name = column['code_name']
+
+            if column['widget'] == "button":
+                text = column['text'] if row is not None else ""
+                if displayed[code_name] != text:
+                    if row is None:
+                        widgets[code_name].grid_remove()
+                    else:
+                        widgets[code_name].grid()
+            else:
+                text = row.get(code_name, "") if row is not None else ""
+                if displayed[code_name] != text:
+                    widgets[code_name].configure(text=text)
+
+            displayed[code_name] = text
+
+    def _update_scrollbar(self):
+        if len(self._keys) <= self._visible_rows:
+            self._vsb.set(0, 1)
+        else:
+            self._vsb.set(self._offset / len(self._keys), (self._offset + self._visible_rows) / len(self._keys))
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, len(self._keys) - self._visible_rows))
+
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _on_scroll(self, action: str, amount: str, unit: typing.Optional[str] = None):
+
+        """
+        Scrollbar callback, called with ("moveto", fraction) or ("scroll", number, "units" or "pages").
+        :return:
+        """
+
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self._keys)))
+        elif action == "scroll":
+            step = self._visible_rows if unit == "pages" else 1
+            self._scroll_to(self._offset + int(amount) * step)
+
+    def _activate_mousewheel(self, event: tk.Event):
+        self.bind_all("<MouseWheel>", self._on_mousewheel)
+
+    def _deactivate_mousewheel(self, event: tk.Event):
+        self.unbind_all("<MouseWheel>")
+
+    def _on_mousewheel(self, event: tk.Event):
+        self._scroll_to(self._offset - int(event.delta / 60))  # Decrease 60 to increase the sensitivity
@@ -5,20 +5,19 @@ from models import *
 
 from styling import *
 from autocomplete_widget import Autocomplete
-from scrollable_frame import ScrollableFrame
+from symbol_index import SymbolIndex
+from virtual_table import VirtualTable
 
 from database import WorkspaceData
 
 
 class Watchlist(tk.Frame):
-    def __init__(self, CryptoCom_contracts: typing.Dict[str, Contract], bitmex_contracts: typing.Dict[str, Contract],
-                 *args, **kwargs):
+    def __init__(self, CryptoCom_contracts: typing.Dict[str, Contract], *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.db = WorkspaceData()
 
-        self.CryptoCom_symbols = list(CryptoCom_contracts.keys())
-        self.bitmex_symbols = list(bitmex_contracts.keys())
+        self.CryptoCom_symbols = SymbolIndex(CryptoCom_contracts)  # Built once, searched at each keystroke
 
         self._commands_frame = tk.Frame(self, bg=BG_COLOR)
         self._commands_frame.pack(side=tk.TOP)
@@ -34,16 +33,6 @@ class Watchlist(tk.Frame):
         self._CryptoCom_entry.bind("<Return>", self._add_CryptoCom_symbol)
         self._CryptoCom_entry.grid(row=1, column=0, padx=5)
 
-        self._bitmex_label = tk.Label(self._commands_frame, text="Bitmex", bg=BG_COLOR, fg=FG_COLOR, font=BOLD_FONT)
-        self._bitmex_label.grid(row=0, column=1)
-
-        self._bitmex_entry = Autocomplete(self.bitmex_symbols, self._commands_frame, fg=FG_COLOR, justify=tk.CENTER,
-                                      insertbackground=FG_COLOR, bg=BG_COLOR_2, highlightthickness=False)
-        self._bitmex_entry.bind("<Return>", self._add_bitmex_symbol)
-        self._bitmex_entry.grid(row=1, column=1)
-
-        self.body_widgets = dict()
-
         self._headers = ["symbol", "exchange", "bid", "ask", "remove"]
 
         self._headers_frame = tk.Frame(self._table_frame, bg=BG_COLOR)
@@ -63,17 +52,14 @@ class Watchlist(tk.Frame):
 
         self._headers_frame.pack(side=tk.TOP, anchor="nw")
 
-        # Creates the table body
+        # Creates the table body, only the visible rows have widgets, the symbols are kept in the table data model
 
-        self._body_frame = ScrollableFrame(self._table_frame, bg=BG_COLOR, height=250)
-        self._body_frame.pack(side=tk.TOP, fill=tk.X, anchor="nw")
+        columns = [{"code_name": h, "widget": "label", "width": self._col_width} for h in self._headers[:-1]]
+        columns.append({"code_name": "remove", "widget": "button", "width": 4, "text": "X", "bg": "darkred",
+                        "command": self._remove_symbol})
 
-        # Add keys to the body_widgets dictionary, the keys represents columns or data related to a column
-        # You could also have another logic: instead of body_widgets[column][row] have body_widgets[row][column]
-        for h in self._headers:
-            self.body_widgets[h] = dict()
-            if h in ["bids", "asks"]:
-                self.body_widgets[h + "_var"] = dict()
+        self._table = VirtualTable(columns, 10, self._table_frame, bg=BG_COLOR)
+        self._table.pack(side=tk.TOP, fill=tk.X, anchor="nw")
 
         self._body_index = 0
 
@@ -83,11 +69,24 @@ class Watchlist(tk.Frame):
         for s in saved_symbols:
             self._add_symbol(s['symbol'], s['exchange'])
 
-    def _remove_symbol(self, b_index: int):
+    def symbols(self) -> typing.List[typing.Tuple[int, str, str]]:
+
+        """
+        Rows of the watchlist, in display order.
+        :return: A list of (row index, symbol, exchange)
+        """
 
-        for h in self._headers:
-            self.body_widgets[h][b_index].grid_forget()
-            del self.body_widgets[h][b_index]
+        return [(b_index, self._table.get(b_index)['symbol'], self._table.get(b_index)['exchange'])
+                for b_index in self._table.keys()]
+
+    def set_prices(self, b_index: int, bid: str, ask: str):
+        self._table.update(b_index, {"bid": bid, "ask": ask})
+
+    def has_prices(self, b_index: int) -> bool:
+        return "bid" in self._table.get(b_index)
+
+    def _remove_symbol(self, b_index: int):
+        self._table.remove(b_index)
 
     def _add_CryptoCom_symbol(self, event):
         get_instrument = event.widget.get()
@@ -96,41 +95,10 @@ class Watchlist(tk.Frame):
             self._add_symbol(get_instrument, "CryptoCom")
             event.widget.delete(0, tk.END)
 
-    def _add_bitmex_symbol(self, event):
-        symbol = event.widget.get()
-
-        if symbol in self.bitmex_symbols:
-            self._add_symbol(symbol, "Bitmex")
-            event.widget.delete(0, tk.END)
-
     def _add_symbol(self, symbol: str, exchange: str):
 
         b_index = self._body_index
 
-        self.body_widgets['symbol'][b_index] = tk.Label(self._body_frame.sub_frame, text=symbol, bg=BG_COLOR,
-                                                        fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['symbol'][b_index].grid(row=b_index, column=0)
-
-        self.body_widgets['exchange'][b_index] = tk.Label(self._body_frame.sub_frame, text=exchange, bg=BG_COLOR,
-                                                          fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['exchange'][b_index].grid(row=b_index, column=1)
-
-        self.body_widgets['bid_var'][b_index] = tk.StringVar()
-        self.body_widgets['bid'][b_index] = tk.Label(self._body_frame.sub_frame,
-                                                     textvariable=self.body_widgets['bid_var'][b_index],
-                                                     bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['bid'][b_index].grid(row=b_index, column=2)
-
-        self.body_widgets['ask_var'][b_index] = tk.StringVar()
-        self.body_widgets['ask'][b_index] = tk.Label(self._body_frame.sub_frame,
-                                                     textvariable=self.body_widgets['ask_var'][b_index],
-                                                     bg=BG_COLOR, fg=FG_COLOR_2, font=GLOBAL_FONT, width=self._col_width)
-        self.body_widgets['ask'][b_index].grid(row=b_index, column=3)
-
-        self.body_widgets['remove'][b_index] = tk.Button(self._body_frame.sub_frame, text="X",
-                                                         bg="darkred", fg=FG_COLOR, font=GLOBAL_FONT,
-                                                         command=lambda: self._remove_symbol(b_index), width=4)
-        self.body_widgets['remove'][b_index].grid(row=b_index, column=4)
+        self._table.insert(b_index, {"symbol": symbol, "exchange": exchange})
 
         self._body_index += 1
-